@@ -6,6 +6,8 @@ from fastapi import APIRouter, Depends, Query
 from typing import Optional
 
 from app.core.auth import get_api_key
+from app.core.config import settings
+from app.core.metrics_cache import metrics_cache
 from app.services.analytics.tracker import get_analytics_summary, tracker
 
 router = APIRouter()
@@ -21,7 +23,11 @@ async def get_summary(
     
     Requires API key authentication.
     """
-    summary = get_analytics_summary(hours=hours)
+    summary = await metrics_cache.get_or_compute_async(
+        ("summary", hours),
+        settings.analytics_cache_ttl,
+        lambda: get_analytics_summary(hours=hours),
+    )
     
     return {
         "status": "success",
@@ -40,7 +46,11 @@ async def get_stats(
     If metric name provided, returns stats for that metric only.
     Otherwise returns all available stats.
     """
-    stats = tracker.get_stats(metric_name=metric)
+    stats = await metrics_cache.get_or_compute_async(
+        ("stats", metric),
+        settings.analytics_cache_ttl,
+        lambda: tracker.get_stats(metric_name=metric),
+    )
     
     return {
         "status": "success",
@@ -51,17 +61,25 @@ async def get_stats(
 
 @router.get("/counters")
 async def get_counters(api_key: str = Depends(get_api_key)):
-    """Get all counter values."""
+    """
+    Get all counter values.
+    
+    Served from the tracker's counters snapshot (at most ~1s stale).
+    """
     return {
         "status": "success",
-        "data": dict(tracker.counters),
+        "data": tracker.snapshot()["counters"],
     }
 
 
 @router.get("/timers")
 async def get_timers(api_key: str = Depends(get_api_key)):
     """Get timing statistics."""
-    stats = tracker.get_stats()
+    stats = await metrics_cache.get_or_compute_async(
+        ("stats", None),
+        settings.analytics_cache_ttl,
+        tracker.get_stats,
+    )
     
     return {
         "status": "success",
@@ -77,6 +95,7 @@ async def reset_metrics(api_key: str = Depends(get_api_key)):
     WARNING: This clears all analytics data!
     """
     tracker.reset()
+    metrics_cache.clear()
     
     return {
         "status": "success",
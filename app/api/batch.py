@@ -2,28 +2,53 @@
 Batch processing endpoints for bulk operations.
 """
 
-from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from celery import group
+from pathlib import Path
+from dataclasses import dataclass
+import asyncio
+import uuid
 import zipfile
-import io
+import orjson
+import shutil
+import tempfile
 
-from app.core.database import get_db
-from app.core.auth import get_api_key
+from app.core.config import settings
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.core.auth import rate_limit
 from app.models.database import Document
-from app.services.storage.storage import StorageService
+from app.services.storage.storage import StorageService, hash_stream, spool_upload
 from app.tasks.extraction import extract_document
 
 router = APIRouter()
 
+ZIP_COPY_CHUNK_SIZE = 64 * 1024
+MAX_ZIP_COMPRESSION_RATIO = 100  # Entries that inflate more than this are rejected
+ZIP_SKIP_PREFIXES = (".", "__MACOSX/")  # Hidden files and macOS resource forks
+BATCH_STATUS_PAGE_SIZE = 500  # Rows fetched per round-trip when streaming status
+
+
+@dataclass
+class _ZipEntry:
+    """A ZIP entry decompressed to a temp file, awaiting storage."""
+    filename: str
+    path: Path
+    file_size: int
+    content_sha256: str
+
 
 class BatchUploadResponse(BaseModel):
     """Response for batch upload."""
     batch_id: str
     total_files: int
-    uploaded_documents: List[int]
+    uploaded_documents: List[str]
     failed_files: List[dict]
+    duplicates: List[dict] = []  # Files already uploaded: filename + existing document_id
 
 
 class BatchJob(BaseModel):
@@ -41,8 +66,8 @@ async def batch_upload(
     files: List[UploadFile] = File(...),
     company_id: str = "default",
     background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    db: AsyncSession = Depends(get_async_db),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Upload multiple files at once.
@@ -56,43 +81,50 @@ async def batch_upload(
             detail="Maximum 100 files per batch",
         )
     
-    import uuid
     batch_id = str(uuid.uuid4())
     
     storage = StorageService()
-    uploaded_documents = []
+    rows = []
     failed_files = []
+    duplicates = []
+    duplicate_digests = []
+    
+    # Hash everything up front so known files skip storage and extraction
+    digests = [await asyncio.to_thread(hash_stream, file.file) for file in files]
+    known = await _known_digests(db, company_id, digests)
     
-    for file in files:
+    for file, content_sha256 in zip(files, digests):
+        if content_sha256 in known:
+            duplicates.append({
+                "filename": file.filename,
+                "document_id": known[content_sha256],
+            })
+            duplicate_digests.append(content_sha256)
+            continue
+        
         try:
-            # Read file
-            file_data = await file.read()
-            
-            # Store
-            storage_path = storage.store_file(
-                file_data=file_data,
-                filename=file.filename,
-            )
-            
-            # Create document
-            doc = Document(
+            # Stream Starlette's spooled temp file straight to storage
+            await file.seek(0)
+            storage_key = await asyncio.to_thread(
+                storage.store_stream,
+                file.file,
                 filename=file.filename,
-                file_type=file.content_type or "application/octet-stream",
-                storage_path=storage_path,
-                status="uploaded",
                 company_id=company_id,
-                source="batch_upload",
-                metadata={"batch_id": batch_id},
+                content_type=file.content_type,
             )
             
-            db.add(doc)
-            db.commit()
-            db.refresh(doc)
-            
-            # Queue extraction
-            extract_document.delay(doc.id)
-            
-            uploaded_documents.append(doc.id)
+            rows.append({
+                "filename": file.filename,
+                "content_type": file.content_type or "application/octet-stream",
+                "file_size": file.size,
+                "storage_key": storage_key,
+                "content_sha256": content_sha256,
+                "status": "uploaded",
+                "company_id": company_id,
+                "batch_id": batch_id,
+            })
+            # Later copies within this batch resolve to this one after insert
+            known[content_sha256] = None
             
         except Exception as e:
             failed_files.append({
@@ -100,11 +132,16 @@ async def batch_upload(
                 "error": str(e),
             })
     
+    # One INSERT for the whole batch, then queue extraction
+    uploaded_documents = await _insert_and_queue(db, rows)
+    _resolve_duplicates(duplicates, duplicate_digests, rows, uploaded_documents)
+    
     return BatchUploadResponse(
         batch_id=batch_id,
         total_files=len(files),
         uploaded_documents=uploaded_documents,
         failed_files=failed_files,
+        duplicates=duplicates,
     )
 
 
@@ -112,8 +149,8 @@ async def batch_upload(
 async def batch_upload_zip(
     file: UploadFile = File(...),
     company_id: str = "default",
-    db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    db: AsyncSession = Depends(get_async_db),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Upload a ZIP file containing multiple documents.
@@ -127,101 +164,73 @@ async def batch_upload_zip(
             detail="File must be a ZIP archive",
         )
     
-    # Read ZIP
-    zip_data = await file.read()
-    zip_file = zipfile.ZipFile(io.BytesIO(zip_data))
-    
-    import uuid
     batch_id = str(uuid.uuid4())
     
-    storage = StorageService()
-    uploaded_documents = []
-    failed_files = []
-    
-    # Extract and process each file
-    for file_info in zip_file.filelist:
-        # Skip directories
-        if file_info.is_dir():
-            continue
-        
-        # Skip hidden files
-        if file_info.filename.startswith('.') or '/__MACOSX/' in file_info.filename:
-            continue
+    # Spool ZIP to disk so zipfile can seek instead of holding it in memory
+    zip_path = await spool_upload(file)
+    entries = []
+    try:
+        with zipfile.ZipFile(zip_path) as zip_file:
+            # Decompression, hashing and storage are blocking; keep them off
+            # the event loop
+            entries, failed_files = await asyncio.to_thread(_spool_zip_entries, zip_file)
         
-        try:
-            # Extract file
-            file_data = zip_file.read(file_info.filename)
-            
-            # Get clean filename
-            filename = file_info.filename.split('/')[-1]
-            
-            # Store
-            storage_path = storage.store_file(
-                file_data=file_data,
-                filename=filename,
-            )
-            
-            # Create document
-            doc = Document(
-                filename=filename,
-                file_type="application/octet-stream",  # Will be detected during extraction
-                storage_path=storage_path,
-                status="uploaded",
-                company_id=company_id,
-                source="batch_zip",
-                metadata={
-                    "batch_id": batch_id,
-                    "original_path": file_info.filename,
-                },
-            )
-            
-            db.add(doc)
-            db.commit()
-            db.refresh(doc)
-            
-            # Queue extraction
-            extract_document.delay(doc.id)
-            
-            uploaded_documents.append(doc.id)
-            
-        except Exception as e:
-            failed_files.append({
-                "filename": file_info.filename,
-                "error": str(e),
-            })
+        known = await _known_digests(db, company_id, [entry.content_sha256 for entry in entries])
+        rows, duplicates, duplicate_digests, store_failures = await asyncio.to_thread(
+            _store_zip_entries, entries, known, company_id, batch_id
+        )
+        failed_files.extend(store_failures)
+    finally:
+        zip_path.unlink(missing_ok=True)
+        for entry in entries:
+            entry.path.unlink(missing_ok=True)
+    
+    uploaded_documents = await _insert_and_queue(db, rows)
+    _resolve_duplicates(duplicates, duplicate_digests, rows, uploaded_documents)
     
     return {
         "status": "success",
         "batch_id": batch_id,
-        "total_files": len(uploaded_documents) + len(failed_files),
+        "total_files": len(uploaded_documents) + len(failed_files) + len(duplicates),
         "uploaded": len(uploaded_documents),
         "failed": len(failed_files),
         "document_ids": uploaded_documents,
         "errors": failed_files,
+        "duplicates": duplicates,
     }
 
 
 @router.get("/status/{batch_id}")
 async def get_batch_status(
     batch_id: str,
-    db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    include_docs: bool = False,
+    limit: int = Query(500, ge=1, le=5000),
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_async_db),
+    api_key: str = Depends(rate_limit),
 ):
-    """Get status of a batch processing job."""
+    """
+    Get status of a batch processing job.
+    
+    Pass include_docs=true to also list the batch's documents (up to limit).
+    With format=ndjson the summary is sent as the first line, followed by
+    one line per document in the batch, streamed without a limit.
+    """
     
-    # Query documents in this batch
-    documents = db.query(Document).filter(
-        Document.metadata["batch_id"].astext == batch_id
-    ).all()
+    # Count statuses in one aggregate query
+    counts = dict((await db.execute(
+        select(Document.status, func.count())
+        .where(Document.batch_id == batch_id)
+        .group_by(Document.status)
+    )).all())
     
-    if not documents:
+    if not counts:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Count statuses
-    total = len(documents)
-    completed = sum(1 for d in documents if d.status == "extracted")
-    failed = sum(1 for d in documents if d.status == "failed")
-    in_progress = sum(1 for d in documents if d.status in ["uploaded", "processing"])
+    total = sum(counts.values())
+    completed = counts.get("extracted", 0)
+    failed = counts.get("failed", 0)
+    in_progress = counts.get("uploaded", 0) + counts.get("processing", 0)
     
     # Determine overall status
     if failed == total:
@@ -233,7 +242,7 @@ async def get_batch_status(
     else:
         overall_status = "pending"
     
-    return {
+    response = {
         "status": "success",
         "batch_id": batch_id,
         "total_files": total,
@@ -241,23 +250,29 @@ async def get_batch_status(
         "failed": failed,
         "in_progress": in_progress,
         "overall_status": overall_status,
-        "documents": [
-            {
-                "id": d.id,
-                "filename": d.filename,
-                "status": d.status,
-                "error": d.error_message,
-            }
-            for d in documents
-        ],
     }
+    
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_batch_documents(batch_id, response),
+            media_type="application/x-ndjson",
+        )
+    
+    if include_docs:
+        rows = (await db.execute(
+            _batch_documents_query(batch_id).limit(limit)
+        )).all()
+        
+        response["documents"] = [_document_status_row(row) for row in rows]
+    
+    return response
 
 
 @router.post("/push-all/{batch_id}")
 async def push_batch_to_qbo(
     batch_id: str,
-    db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    db: AsyncSession = Depends(get_async_db),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Push all successfully extracted documents in a batch to QBO.
@@ -266,30 +281,235 @@ async def push_batch_to_qbo(
     """
     from app.tasks.extraction import push_to_qbo
     
-    # Get extracted documents in batch
-    documents = db.query(Document).filter(
-        Document.metadata["batch_id"].astext == batch_id,
-        Document.status == "extracted",
-        Document.qbo_sync_status == None,
-    ).all()
+    # Only IDs are needed to queue the pushes
+    document_ids = (await db.scalars(
+        select(Document.id).where(
+            Document.batch_id == batch_id,
+            Document.status == "extracted",
+            Document.qbo_sync_status == None,
+        )
+    )).all()
     
-    if not documents:
+    if not document_ids:
         return {
             "status": "success",
             "message": "No documents ready to push",
             "pushed": 0,
         }
     
-    # Queue push tasks
-    task_ids = []
-    for doc in documents:
-        task = push_to_qbo.delay(doc.id)
-        task_ids.append(task.id)
+    # Queue push tasks in a single publish
+    result = group(push_to_qbo.s(doc_id) for doc_id in document_ids).apply_async()
+    task_ids = [r.id for r in result.results]
     
     return {
         "status": "success",
         "batch_id": batch_id,
-        "pushed": len(documents),
-        "document_ids": [d.id for d in documents],
+        "pushed": len(document_ids),
+        "document_ids": document_ids,
         "task_ids": task_ids,
     }
+
+
+# --- Helpers ---
+
+def _batch_documents_query(batch_id: str):
+    """Select the per-document status columns for a batch."""
+    return (
+        select(
+            Document.id,
+            Document.filename,
+            Document.status,
+            Document.error_message,
+        )
+        .where(Document.batch_id == batch_id)
+    )
+
+
+def _document_status_row(row) -> dict:
+    """Shape a document status row for the batch status response."""
+    return {
+        "id": row.id,
+        "filename": row.filename,
+        "status": row.status,
+        "error": row.error_message,
+    }
+
+
+async def _stream_batch_documents(batch_id: str, summary: dict) -> AsyncIterator[bytes]:
+    """
+    Yield the batch summary, then each document, as NDJSON lines.
+    
+    The body is sent after the endpoint returns, when the request's session
+    may already be closed, so rows are streamed from a session of its own.
+    """
+    yield orjson.dumps(summary) + b"\n"
+    
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(
+            _batch_documents_query(batch_id)
+            .execution_options(yield_per=BATCH_STATUS_PAGE_SIZE)
+        )
+        async for row in rows:
+            yield orjson.dumps(_document_status_row(row)) + b"\n"
+
+def _spool_zip_entry(zip_file: zipfile.ZipFile, file_info: zipfile.ZipInfo) -> Path:
+    """
+    Decompress a single ZIP entry to a temp file, streaming.
+    
+    Entries are checked against the declared sizes first so a zip bomb is
+    rejected before anything is inflated.
+    """
+    max_size = settings.max_file_size_mb * 1024 * 1024
+    if file_info.file_size > max_size:
+        raise ValueError(f"Entry exceeds {settings.max_file_size_mb} MB limit")
+    if file_info.file_size > file_info.compress_size * MAX_ZIP_COMPRESSION_RATIO:
+        raise ValueError("Entry compression ratio is suspiciously high")
+    
+    suffix = Path(file_info.filename).suffix
+    with zip_file.open(file_info) as src, \
+            tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as dst:
+        shutil.copyfileobj(src, dst, ZIP_COPY_CHUNK_SIZE)
+    return Path(dst.name)
+
+
+def _spool_zip_entries(zip_file: zipfile.ZipFile) -> Tuple[List[_ZipEntry], List[dict]]:
+    """
+    Decompress and hash every document in an opened ZIP archive.
+    
+    Returns the spooled entries (the caller deletes their temp files) and
+    the entries that failed.
+    """
+    entries = []
+    failed_files = []
+    
+    for file_info in zip_file.infolist():
+        name = file_info.filename
+        
+        # Skip directories, hidden files and macOS metadata
+        if name.endswith("/") or name.startswith(ZIP_SKIP_PREFIXES) or "/__MACOSX/" in name:
+            continue
+        
+        try:
+            entry_path = _spool_zip_entry(zip_file, file_info)
+            try:
+                with entry_path.open("rb") as f:
+                    content_sha256 = hash_stream(f)
+            except Exception:
+                entry_path.unlink(missing_ok=True)
+                raise
+        except Exception as e:
+            failed_files.append({
+                "filename": name,
+                "error": str(e),
+            })
+            continue
+        
+        entries.append(_ZipEntry(
+            filename=name.split('/')[-1],
+            path=entry_path,
+            file_size=file_info.file_size,
+            content_sha256=content_sha256,
+        ))
+    
+    return entries, failed_files
+
+
+def _store_zip_entries(
+    entries: List[_ZipEntry],
+    known: Dict[str, Optional[str]],
+    company_id: str,
+    batch_id: str,
+) -> Tuple[List[dict], List[dict], List[str], List[dict]]:
+    """
+    Store the spooled ZIP entries that aren't duplicates.
+    
+    known maps content hashes to existing document ids and is updated as
+    entries are stored. Returns the document rows to insert, the duplicates
+    with their hashes, and the entries that failed.
+    """
+    storage = StorageService()
+    rows = []
+    duplicates = []
+    duplicate_digests = []
+    failed_files = []
+    
+    for entry in entries:
+        if entry.content_sha256 in known:
+            duplicates.append({
+                "filename": entry.filename,
+                "document_id": known[entry.content_sha256],
+            })
+            duplicate_digests.append(entry.content_sha256)
+            continue
+        
+        try:
+            storage_key = storage.store_path(
+                entry.path,
+                filename=entry.filename,
+                company_id=company_id,
+            )
+        except Exception as e:
+            failed_files.append({
+                "filename": entry.filename,
+                "error": str(e),
+            })
+            continue
+        
+        rows.append({
+            "filename": entry.filename,
+            "content_type": "application/octet-stream",  # Will be detected during extraction
+            "file_size": entry.file_size,
+            "storage_key": storage_key,
+            "content_sha256": entry.content_sha256,
+            "status": "uploaded",
+            "company_id": company_id,
+            "batch_id": batch_id,
+        })
+        known[entry.content_sha256] = None
+    
+    return rows, duplicates, duplicate_digests, failed_files
+
+
+async def _known_digests(db: AsyncSession, company_id: str, digests: List[str]) -> Dict[str, Optional[str]]:
+    """Map the company's already-uploaded content hashes to their document ids."""
+    if not digests:
+        return {}
+    return dict((await db.execute(
+        select(Document.content_sha256, Document.id).where(
+            Document.company_id == company_id,
+            Document.content_sha256.in_(set(digests)),
+        )
+    )).all())
+
+
+def _resolve_duplicates(
+    duplicates: List[dict],
+    duplicate_digests: List[str],
+    rows: List[dict],
+    document_ids: List[str],
+) -> None:
+    """Point in-batch duplicates at the document id their first copy was inserted as."""
+    inserted = {row["content_sha256"]: doc_id for row, doc_id in zip(rows, document_ids)}
+    for duplicate, content_sha256 in zip(duplicates, duplicate_digests):
+        if duplicate["document_id"] is None:
+            duplicate["document_id"] = inserted.get(content_sha256)
+
+
+async def _insert_and_queue(db: AsyncSession, rows: List[dict]) -> List[str]:
+    """
+    Insert document rows with a single INSERT ... RETURNING and commit once.
+    
+    Extraction tasks are then published as one Celery group.
+    """
+    if not rows:
+        return []
+    
+    result = await db.execute(
+        insert(Document).returning(Document.id, sort_by_parameter_order=True), rows
+    )
+    document_ids = [row.id for row in result]
+    await db.commit()
+    
+    group(extract_document.s(doc_id) for doc_id in document_ids).apply_async()
+    
+    return document_ids
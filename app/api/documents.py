@@ -8,10 +8,16 @@ This is the main API for document processing:
 4. Push to QBO with attachments
 """
 
+import asyncio
 import os
+from datetime import datetime, time
 from typing import Optional, List
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, BackgroundTasks
+import orjson
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, BackgroundTasks, Response
 from pydantic import BaseModel
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.documents import (
     DocumentType,
@@ -25,13 +31,19 @@ from app.schemas.documents import (
     PushToQBOResponse,
     TransactionMatch,
 )
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.models.database import Document, ExtractedTransaction
+from app.services.storage.storage import StorageService, hash_stream
+from app.services.extraction.pdf_utils import detect_mime_type, is_pdf
 
 
 router = APIRouter()
 
+# Resolved once at import rather than per document
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
-# In-memory storage for demo (replace with database)
-documents_db = {}
+MIME_SNIFF_BYTES = 4096
 
 
 class DocumentStatus(BaseModel):
@@ -50,6 +62,7 @@ async def upload_document(
     company_id: str = "default",
     auto_process: bool = True,
     background_tasks: BackgroundTasks = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Upload a document for processing.
@@ -73,38 +86,62 @@ async def upload_document(
         "image/heic",
     ]
     
-    content_type = file.content_type or "application/octet-stream"
+    # Trust the file's magic bytes over the client-supplied header
+    header = await file.read(MIME_SNIFF_BYTES)
+    content_type = detect_mime_type(header) or file.content_type or "application/octet-stream"
     if content_type not in allowed_types:
         raise HTTPException(
             status_code=400,
             detail=f"File type '{content_type}' not supported. Use PDF, PNG, JPG, or HEIC."
         )
     
-    # Generate document ID
-    import uuid
-    doc_id = f"doc_{uuid.uuid4().hex[:12]}"
-    
-    # Read file content
-    content = await file.read()
-    
-    # Store document info (in production, save to database)
-    documents_db[doc_id] = {
-        "id": doc_id,
-        "filename": file.filename,
-        "content_type": content_type,
-        "content": content,  # In production, store in S3/R2
-        "company_id": company_id,
-        "status": ProcessingStatus.UPLOADED,
-        "document_type": None,
-        "extracted_data": None,
-    }
+    # Re-uploads of identical bytes return the existing document, skipping
+    # storage and extraction
+    await file.seek(0)
+    content_sha256 = await asyncio.to_thread(hash_stream, file.file)
+    existing = await _find_duplicate(db, company_id, content_sha256)
+    if existing is not None:
+        return _duplicate_response(existing)
+    
+    # Stream file content to storage (Starlette already spooled it to disk).
+    # Storage I/O is blocking, so keep it off the event loop.
+    storage = StorageService()
+    storage_key = await asyncio.to_thread(
+        storage.store_stream,
+        file.file,
+        filename=file.filename,
+        company_id=company_id,
+        content_type=content_type,
+    )
+    
+    # Persist metadata only; the bytes live in storage
+    doc = Document(
+        filename=file.filename,
+        content_type=content_type,
+        file_size=file.size,
+        storage_key=storage_key,
+        content_sha256=content_sha256,
+        company_id=company_id,
+        status=ProcessingStatus.UPLOADED.value,
+    )
+    db.add(doc)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same file won the race
+        await db.rollback()
+        await asyncio.to_thread(storage.delete_file, storage_key)
+        existing = await _find_duplicate(db, company_id, content_sha256)
+        if existing is None:
+            raise
+        return _duplicate_response(existing)
     
     # Queue processing if auto_process
     if auto_process and background_tasks:
-        background_tasks.add_task(process_document, doc_id)
+        background_tasks.add_task(process_document, doc.id)
     
     return DocumentUploadResponse(
-        id=doc_id,
+        id=doc.id,
         filename=file.filename,
         status=ProcessingStatus.UPLOADED,
         message="Document uploaded successfully. Processing started." if auto_process else "Document uploaded. Call /extract to process.",
@@ -112,23 +149,22 @@ async def upload_document(
 
 
 @router.get("/{document_id}", response_model=DocumentStatus)
-async def get_document(document_id: str):
+async def get_document(document_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get document status and details."""
-    if document_id not in documents_db:
-        raise HTTPException(status_code=404, detail="Document not found")
+    doc = await _get_document_or_404(db, document_id)
     
-    doc = documents_db[document_id]
     return DocumentStatus(
-        id=doc["id"],
-        filename=doc["filename"],
-        status=doc["status"],
-        document_type=doc.get("document_type"),
-        storage_key=doc.get("storage_key"),
+        id=doc.id,
+        filename=doc.filename,
+        status=doc.status,
+        document_type=doc.document_type,
+        storage_key=doc.storage_key,
+        error=doc.error_message,
     )
 
 
 @router.post("/{document_id}/extract", response_model=ExtractionResponse)
-async def extract_document(document_id: str):
+async def extract_document(document_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Manually trigger AI extraction for a document.
     
@@ -137,42 +173,40 @@ async def extract_document(document_id: str):
     2. Extract relevant data based on type
     3. Store results for review
     """
-    if document_id not in documents_db:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = documents_db[document_id]
+    doc = await _get_document_or_404(db, document_id)
     
     # Check if already extracted
-    if doc["status"] == ProcessingStatus.EXTRACTED:
+    if doc.status == ProcessingStatus.EXTRACTED:
         return _build_extraction_response(doc)
     
     # Process the document
     await process_document(document_id)
     
     # Return updated data
-    doc = documents_db[document_id]
+    await db.refresh(doc)
     return _build_extraction_response(doc)
 
 
 @router.get("/{document_id}/extracted", response_model=ExtractionResponse)
-async def get_extracted_data(document_id: str):
+async def get_extracted_data(document_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get the extracted data for a document."""
-    if document_id not in documents_db:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = documents_db[document_id]
+    doc = await _get_document_or_404(db, document_id)
     
-    if doc["status"] not in [ProcessingStatus.EXTRACTED, ProcessingStatus.MATCHED, ProcessingStatus.PUSHED]:
+    if doc.status not in [ProcessingStatus.EXTRACTED, ProcessingStatus.MATCHED, ProcessingStatus.PUSHED]:
         raise HTTPException(
             status_code=400, 
-            detail=f"Document not yet extracted. Current status: {doc['status']}"
+            detail=f"Document not yet extracted. Current status: {doc.status}"
         )
     
+    # The cached payload embeds the status, so only serve it while unchanged
+    if doc.response_json and doc.status == ProcessingStatus.EXTRACTED:
+        return Response(content=doc.response_json, media_type="application/json")
+    
     return _build_extraction_response(doc)
 
 
 @router.post("/{document_id}/match-to-qbo", response_model=BankStatementMatchResponse)
-async def match_to_qbo(document_id: str):
+async def match_to_qbo(document_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Match extracted transactions to QBO bank feed.
     
@@ -182,18 +216,15 @@ async def match_to_qbo(document_id: str):
     3. Link check images to matched transactions
     4. Return match results for review
     """
-    if document_id not in documents_db:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = documents_db[document_id]
+    doc = await _get_document_or_404(db, document_id)
     
-    if doc["document_type"] != DocumentType.BANK_STATEMENT:
+    if doc.document_type != DocumentType.BANK_STATEMENT:
         raise HTTPException(
             status_code=400,
             detail="Matching only available for bank statements"
         )
     
-    if not doc.get("extracted_data"):
+    if not doc.extracted_data:
         raise HTTPException(
             status_code=400,
             detail="Document not yet extracted"
@@ -218,6 +249,7 @@ async def push_to_qbo(
     create_as: str = "expense",  # expense, bill
     auto_create_vendors: bool = True,
     attach_documents: bool = True,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Push extracted data to QuickBooks Online.
@@ -238,10 +270,7 @@ async def push_to_qbo(
     - Creates vendor if needed
     - Attaches receipt image
     """
-    if document_id not in documents_db:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    doc = documents_db[document_id]
+    doc = await _get_document_or_404(db, document_id)
     
     if create_as not in ["expense", "bill"]:
         raise HTTPException(
@@ -267,74 +296,150 @@ async def process_document(document_id: str):
     """
     Process a document: classify and extract.
     
-    This runs in background after upload.
+    This runs in background after upload, so it opens its own session.
     """
-    if document_id not in documents_db:
-        return
-    
-    doc = documents_db[document_id]
-    
-    try:
-        # Update status
-        doc["status"] = ProcessingStatus.CLASSIFYING
-        
-        # Get AI extractor
-        api_key = os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            doc["status"] = ProcessingStatus.FAILED
-            doc["error"] = "No AI API key configured"
+    async with AsyncSessionLocal() as db:
+        doc = await db.get(Document, document_id)
+        if doc is None:
             return
         
-        provider = "openai" if os.getenv("OPENAI_API_KEY") else "anthropic"
-        
-        from app.services.extraction.extractor import DocumentExtractor
-        extractor = DocumentExtractor(api_key=api_key, provider=provider)
-        
-        content = doc["content"]
-        
-        # Classify document
-        doc_type = extractor.classify_document(content)
-        doc["document_type"] = doc_type
-        doc["status"] = ProcessingStatus.EXTRACTING
-        
-        # Extract based on type
-        if doc_type == DocumentType.RECEIPT or doc_type == DocumentType.INVOICE:
-            extracted = extractor.extract_receipt(content)
-            doc["extracted_data"] = extracted.model_dump()
+        try:
+            # Update status
+            doc.status = ProcessingStatus.CLASSIFYING.value
+            await db.commit()
             
-        elif doc_type == DocumentType.BANK_STATEMENT:
-            # For PDF, we'd need to convert to images first
-            # For now, treat single image as one page
-            extracted = extractor.extract_bank_statement([content])
-            doc["extracted_data"] = extracted.model_dump()
+            # Get AI extractor
+            if not (OPENAI_API_KEY or ANTHROPIC_API_KEY):
+                doc.status = ProcessingStatus.FAILED.value
+                doc.error_message = "No AI API key configured"
+                await db.commit()
+                return
             
-        elif doc_type == DocumentType.CHECK:
-            extracted = extractor.extract_check(content)
-            doc["extracted_data"] = extracted.model_dump()
+            provider = "openai" if OPENAI_API_KEY else "anthropic"
             
-        else:
-            doc["extracted_data"] = {"raw_type": str(doc_type)}
-        
-        doc["status"] = ProcessingStatus.EXTRACTED
-        
-    except Exception as e:
-        doc["status"] = ProcessingStatus.FAILED
-        doc["error"] = str(e)
+            from app.services.extraction.extractor import get_extractor
+            extractor = get_extractor(provider)
+            
+            # Load bytes from storage. Storage and most extractor calls are
+            # synchronous, so they run in a worker thread.
+            content = await asyncio.to_thread(StorageService().get_file, doc.storage_key)
+            
+            # Classify document, unless an earlier run already did
+            if doc.document_type:
+                doc_type = DocumentType(doc.document_type)
+            else:
+                doc_type = await asyncio.to_thread(extractor.classify_document, content)
+                doc.document_type = doc_type.value
+            doc.status = ProcessingStatus.EXTRACTING.value
+            await db.commit()
+            
+            # Extract based on type
+            if doc_type == DocumentType.RECEIPT or doc_type == DocumentType.INVOICE:
+                extracted = await asyncio.to_thread(extractor.extract_receipt, content)
+                doc.extracted_data = extracted.model_dump(mode="json")
+                
+            elif doc_type == DocumentType.BANK_STATEMENT:
+                # PDFs are rendered page by page as requests go out; images are one page
+                if is_pdf(content):
+                    extracted = await extractor.aextract_bank_statement_pdf(content)
+                else:
+                    extracted = await extractor.aextract_bank_statement([content])
+                doc.extracted_data = extracted.model_dump(mode="json")
+                
+                # Replace any rows from an earlier run with one multi-row INSERT
+                await db.execute(
+                    delete(ExtractedTransaction).where(ExtractedTransaction.document_id == doc.id)
+                )
+                transaction_rows = _transaction_rows(doc.id, extracted)
+                if transaction_rows:
+                    await db.execute(insert(ExtractedTransaction), transaction_rows)
+                
+            elif doc_type == DocumentType.CHECK:
+                extracted = await asyncio.to_thread(extractor.extract_check, content)
+                doc.extracted_data = extracted.model_dump(mode="json")
+                
+            else:
+                doc.extracted_data = {"raw_type": str(doc_type)}
+            
+            doc.status = ProcessingStatus.EXTRACTED.value
+            doc.processed_at = datetime.utcnow()
+            
+            # Serialize once so polling /extracted skips pydantic entirely
+            doc.response_json = orjson.dumps(
+                _build_extraction_response(doc).model_dump(mode="json")
+            ).decode()
+            await db.commit()
+            
+        except Exception as e:
+            # A failed statement (e.g. an oversized transaction row) aborts the
+            # transaction; roll back and re-load the expired row before marking it
+            await db.rollback()
+            doc = await db.get(Document, document_id)
+            doc.status = ProcessingStatus.FAILED.value
+            doc.error_message = str(e)
+            await db.commit()
+
+
+async def _get_document_or_404(db: AsyncSession, document_id: str) -> Document:
+    """Load a document by ID or raise 404."""
+    doc = await db.get(Document, document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
+
+
+async def _find_duplicate(db: AsyncSession, company_id: str, content_sha256: str) -> Optional[Document]:
+    """Find a company's document with identical content, if any."""
+    return await db.scalar(
+        select(Document).where(
+            Document.company_id == company_id,
+            Document.content_sha256 == content_sha256,
+        )
+    )
+
+
+def _duplicate_response(doc: Document) -> DocumentUploadResponse:
+    """Upload response pointing at an already-uploaded document."""
+    return DocumentUploadResponse(
+        id=doc.id,
+        filename=doc.filename,
+        status=doc.status,
+        document_type=doc.document_type,
+        message="Duplicate of an existing document. No new upload was created.",
+    )
+
+
+def _transaction_rows(document_id: str, statement: BankStatementData) -> List[dict]:
+    """ExtractedTransaction insert parameters for each statement transaction."""
+    return [
+        {
+            "document_id": document_id,
+            "date": datetime.combine(txn.date, time.min),
+            "description": txn.description,
+            "amount": txn.amount,
+            "transaction_type": txn.transaction_type,
+            "check_number": txn.check_number,
+            "running_balance": txn.running_balance,
+            "vendor_suggestion": txn.vendor_suggestion,
+            "category_suggestion": txn.category_suggestion,
+        }
+        for txn in statement.transactions
+    ]
 
 
-def _build_extraction_response(doc: dict) -> ExtractionResponse:
-    """Build ExtractionResponse from document dict."""
+def _build_extraction_response(doc: Document) -> ExtractionResponse:
+    """Build ExtractionResponse from a document row."""
     response = ExtractionResponse(
-        id=doc["id"],
-        document_type=doc.get("document_type", DocumentType.UNKNOWN),
-        status=doc["status"],
+        id=doc.id,
+        document_type=doc.document_type or DocumentType.UNKNOWN,
+        status=doc.status,
     )
     
-    extracted = doc.get("extracted_data")
+    extracted = doc.extracted_data
     if not extracted:
         return response
     
-    doc_type = doc.get("document_type")
+    doc_type = doc.document_type
     
     if doc_type in [DocumentType.RECEIPT, DocumentType.INVOICE]:
         response.receipt_data = ReceiptData(**extracted)
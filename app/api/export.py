@@ -3,21 +3,88 @@ Export endpoints for downloading processed data.
 """
 
 import csv
-import json
 import io
+import logging
+import tempfile
 from datetime import datetime, timedelta
-from typing import Optional, List
-from fastapi import APIRouter, Depends, Query, Response, HTTPException
+from typing import AsyncIterator, Iterable, Iterator, Optional, List, Union
+
+import orjson
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.engine import Row, RowMapping
 from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from pydantic import BaseModel
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.auth import get_api_key
+from app.core.auth import rate_limit
+from app.core.redis_client import get_redis
 from app.models.database import Document
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Only the columns each export reads
+SPREADSHEET_COLUMNS = (
+    Document.id,
+    Document.filename,
+    Document.created_at,
+    Document.status,
+    Document.document_type,
+    Document.extracted_data,
+    Document.qbo_id,
+    Document.qbo_sync_status,
+)
+QBO_IMPORT_COLUMNS = (
+    Document.filename,
+    Document.extracted_data,
+)
+
+# Excel header and fixed column width (write-only sheets can't auto-size)
+EXCEL_COLUMNS = (
+    ("ID", 38),
+    ("Filename", 30),
+    ("Upload Date", 18),
+    ("Status", 12),
+    ("Document Type", 16),
+    ("Vendor", 30),
+    ("Amount", 12),
+    ("Date", 12),
+    ("Category", 20),
+    ("QBO ID", 12),
+    ("QBO Status", 12),
+)
+# QuickBooks IIF (tab-delimited) rows
+IIF_TRNS_HEADER = "!TRNS\tTRNSID\tTRNSTYPE\tDATE\tACCNT\tNAME\tAMOUNT\tDOCNUM\tMEMO\tCLEAR\n"
+IIF_SPL_HEADER = "!SPL\tSPLID\tTRNSTYPE\tDATE\tACCNT\tNAME\tAMOUNT\tDOCNUM\tMEMO\tCLEAR\n"
+IIF_TRNS_ROW = "TRNS\t\tCREDIT CARD\t{date}\tCredit Card\t{vendor}\t-{amount}\t{filename}\t{notes}\tN\n"
+IIF_SPL_ROW = "SPL\t\tCREDIT CARD\t{date}\t{category}\t{vendor}\t{amount}\t{filename}\t\tN\n"
+_IIF_SANITIZE = str.maketrans({"\t": " ", "\r": " ", "\n": " "})
+
+# JSON export fields, selected as plain Core rows (no ORM hydration)
+JSON_EXPORT_COLUMNS = (
+    Document.id,
+    Document.filename,
+    Document.content_type.label("file_type"),
+    Document.document_type,
+    Document.status,
+    Document.created_at,
+    Document.processed_at,
+    Document.extracted_data,
+    Document.qbo_id,
+    Document.qbo_sync_status,
+)
+JSON_EXPORT_PAGE_SIZE = 1000
+
+EXCEL_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FILE_CHUNK_SIZE = 64 * 1024
+
 
 class ExportFilter(BaseModel):
     """Filters for export."""
@@ -34,7 +101,7 @@ async def export_csv(
     status: Optional[str] = None,
     days: int = Query(30, ge=1, le=365),
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Export extracted document data as CSV.
@@ -42,8 +109,18 @@ async def export_csv(
     Includes all extracted fields in a flat format.
     Great for importing into spreadsheets or other accounting software.
     """
+    headers = {
+        "Content-Disposition": f"attachment; filename=receipt-ai-export-{datetime.now().strftime('%Y%m%d')}.csv"
+    }
+    
+    # Serve a recent identical export from cache
+    cache_key = _export_cache_key("csv", company_id, status, days)
+    cached = await _get_cached_export(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="text/csv", headers=headers)
+    
     # Build query
-    query = db.query(Document)
+    query = db.query(*SPREADSHEET_COLUMNS)
     
     if company_id:
         query = query.filter(Document.company_id == company_id)
@@ -52,61 +129,17 @@ async def export_csv(
         query = query.filter(Document.status == status)
     
     # Filter by date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(Document.created_at >= start_date)
+    query = _filter_recent(query, days)
     
-    # Order by date
+    # Order by date, fetching in chunks so rows stream as they are read
     query = query.order_by(Document.created_at.desc())
+    documents = query.execution_options(stream_results=True).yield_per(1000)
     
-    documents = query.all()
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    chunks = _iter_csv(_csv_export_rows(documents))
+    if _export_cache_enabled():
+        chunks = _cache_stream(chunks, cache_key)
     
-    # Header
-    writer.writerow([
-        "ID",
-        "Filename",
-        "Upload Date",
-        "Status",
-        "Document Type",
-        "Vendor",
-        "Amount",
-        "Date",
-        "Category",
-        "QBO ID",
-        "QBO Status",
-    ])
-    
-    # Data rows
-    for doc in documents:
-        extracted = doc.extracted_data or {}
-        
-        writer.writerow([
-            doc.id,
-            doc.filename,
-            doc.created_at.isoformat(),
-            doc.status,
-            doc.document_type or "",
-            extracted.get("vendor", ""),
-            extracted.get("total_amount", ""),
-            extracted.get("date", ""),
-            extracted.get("category_suggestion", ""),
-            doc.qbo_id or "",
-            doc.qbo_sync_status or "",
-        ])
-    
-    # Return as download
-    output.seek(0)
-    
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename=receipt-ai-export-{datetime.now().strftime('%Y%m%d')}.csv"
-        },
-    )
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
 
 
 @router.get("/json")
@@ -115,7 +148,7 @@ async def export_json(
     status: Optional[str] = None,
     days: int = Query(30, ge=1, le=365),
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Export extracted document data as JSON.
@@ -124,55 +157,32 @@ async def export_json(
     Great for programmatic processing or backup.
     """
     # Build query
-    query = db.query(Document)
+    stmt = select(*JSON_EXPORT_COLUMNS)
     
     if company_id:
-        query = query.filter(Document.company_id == company_id)
+        stmt = stmt.where(Document.company_id == company_id)
     
     if status:
-        query = query.filter(Document.status == status)
+        stmt = stmt.where(Document.status == status)
     
     # Filter by date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(Document.created_at >= start_date)
+    stmt = _filter_recent(stmt, days)
     
-    # Order by date
-    query = query.order_by(Document.created_at.desc())
-    
-    documents = query.all()
+    # Order by date, streaming rows from a server-side cursor
+    stmt = stmt.order_by(Document.created_at.desc()).execution_options(
+        stream_results=True,
+        yield_per=JSON_EXPORT_PAGE_SIZE,
+    )
+    documents = db.execute(stmt).mappings()
     
-    # Serialize
-    data = {
-        "exported_at": datetime.utcnow().isoformat(),
-        "total_documents": len(documents),
-        "filters": {
-            "company_id": company_id,
-            "status": status,
-            "days": days,
-        },
-        "documents": [
-            {
-                "id": doc.id,
-                "filename": doc.filename,
-                "file_type": doc.file_type,
-                "document_type": doc.document_type,
-                "status": doc.status,
-                "created_at": doc.created_at.isoformat() if doc.created_at else None,
-                "updated_at": doc.updated_at.isoformat() if doc.updated_at else None,
-                "extracted_data": doc.extracted_data,
-                "qbo_id": doc.qbo_id,
-                "qbo_sync_status": doc.qbo_sync_status,
-                "metadata": doc.metadata,
-            }
-            for doc in documents
-        ],
+    filters = {
+        "company_id": company_id,
+        "status": status,
+        "days": days,
     }
     
-    # Return as download
-    json_str = json.dumps(data, indent=2)
-    
-    return Response(
-        content=json_str,
+    return StreamingResponse(
+        _iter_json_export(documents, filters),
         media_type="application/json",
         headers={
             "Content-Disposition": f"attachment; filename=receipt-ai-export-{datetime.now().strftime('%Y%m%d')}.json"
@@ -185,16 +195,16 @@ async def export_qbo_import_format(
     company_id: Optional[str] = None,
     days: int = Query(30, ge=1, le=365),
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    api_key: str = Depends(rate_limit),
 ):
     """
-    Export in QuickBooks import format (IIF/CSV).
+    Export in QuickBooks import format (IIF).
     
-    Creates a CSV that can be imported directly into QuickBooks
-    using their import feature.
+    Creates a tab-delimited IIF file that can be imported directly into
+    QuickBooks using their import feature.
     """
     # Build query for extracted receipts
-    query = db.query(Document).filter(
+    query = db.query(*QBO_IMPORT_COLUMNS).filter(
         Document.status == "extracted",
         Document.document_type == "receipt",
     )
@@ -203,87 +213,15 @@ async def export_qbo_import_format(
         query = query.filter(Document.company_id == company_id)
     
     # Filter by date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(Document.created_at >= start_date)
-    
-    documents = query.all()
-    
-    # Create QuickBooks-compatible CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header (QuickBooks format)
-    writer.writerow([
-        "!TRNS",
-        "TRNSID",
-        "TRNSTYPE",
-        "DATE",
-        "ACCNT",
-        "NAME",
-        "AMOUNT",
-        "DOCNUM",
-        "MEMO",
-        "CLEAR",
-    ])
-    
-    # Split rows
-    writer.writerow([
-        "!SPL",
-        "SPLID",
-        "TRNSTYPE",
-        "DATE",
-        "ACCNT",
-        "NAME",
-        "AMOUNT",
-        "DOCNUM",
-        "MEMO",
-        "CLEAR",
-    ])
-    
-    # Data rows
-    for doc in documents:
-        extracted = doc.extracted_data or {}
-        
-        vendor = extracted.get("vendor", "Unknown Vendor")
-        amount = extracted.get("total_amount", 0)
-        date = extracted.get("date", datetime.now().strftime("%m/%d/%Y"))
-        category = extracted.get("category_suggestion", "Expenses")
-        
-        # Transaction row
-        writer.writerow([
-            "TRNS",
-            "",
-            "CREDIT CARD",
-            date,
-            "Credit Card",
-            vendor,
-            f"-{amount}",
-            doc.filename,
-            extracted.get("notes", ""),
-            "N",
-        ])
-        
-        # Split row (expense account)
-        writer.writerow([
-            "SPL",
-            "",
-            "CREDIT CARD",
-            date,
-            category,
-            vendor,
-            amount,
-            doc.filename,
-            "",
-            "N",
-        ])
+    query = _filter_recent(query, days)
     
-    output.seek(0)
+    documents = query.execution_options(stream_results=True).yield_per(1000)
     
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        _qbo_import_lines(documents),
+        media_type="text/plain",
         headers={
-            "Content-Disposition": f"attachment; filename=qbo-import-{datetime.now().strftime('%Y%m%d')}.csv"
+            "Content-Disposition": f"attachment; filename=qbo-import-{datetime.now().strftime('%Y%m%d')}.iif"
         },
     )
 
@@ -294,24 +232,34 @@ async def export_excel(
     status: Optional[str] = None,
     days: int = Query(30, ge=1, le=365),
     db: Session = Depends(get_db),
-    api_key: str = Depends(get_api_key),
+    api_key: str = Depends(rate_limit),
 ):
     """
     Export as Excel file (.xlsx).
     
-    Requires openpyxl: pip install openpyxl
+    Uses xlsxwriter in constant-memory mode when installed, otherwise
+    openpyxl: pip install xlsxwriter (or openpyxl)
     """
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill
-    except ImportError:
+    write_workbook = _get_excel_writer()
+    if write_workbook is None:
         raise HTTPException(
             status_code=501,
-            detail="Excel export requires openpyxl. Install with: pip install openpyxl"
+            detail="Excel export requires xlsxwriter or openpyxl. Install with: pip install xlsxwriter"
         )
     
+    media_type = EXCEL_MEDIA_TYPE
+    headers = {
+        "Content-Disposition": f"attachment; filename=receipt-ai-export-{datetime.now().strftime('%Y%m%d')}.xlsx",
+    }
+    
+    # Serve a recent identical export from cache
+    cache_key = _export_cache_key("excel", company_id, status, days)
+    cached = await _get_cached_export(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type=media_type, headers=headers)
+    
     # Build query
-    query = db.query(Document)
+    query = db.query(*SPREADSHEET_COLUMNS)
     
     if company_id:
         query = query.filter(Document.company_id == company_id)
@@ -320,65 +268,287 @@ async def export_excel(
         query = query.filter(Document.status == status)
     
     # Filter by date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(Document.created_at >= start_date)
+    query = _filter_recent(query, days)
+    
+    documents = query.execution_options(stream_results=True).yield_per(1000)
+    
+    # Save to a temp file that only spills to disk for large exports.
+    # Fetching rows and writing the workbook both block; keep them off the
+    # event loop.
+    output = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_SIZE)
+    await run_in_threadpool(write_workbook, output, _excel_rows(documents))
+    size = output.tell()
+    output.seek(0)
+    
+    if _export_cache_enabled() and size <= _export_cache_max_bytes():
+        with output:
+            content = output.read()
+        await _set_cached_export(cache_key, content)
+        return Response(content=content, media_type=media_type, headers=headers)
+    
+    return StreamingResponse(_iter_file(output), media_type=media_type, headers=headers)
+
+
+# --- Helpers ---
+
+def _export_cache_enabled() -> bool:
+    return bool(settings.redis_url) and settings.export_cache_ttl > 0
+
+
+def _export_cache_max_bytes() -> int:
+    return settings.export_cache_max_mb * 1024 * 1024
+
+
+def _export_cache_key(kind: str, company_id: Optional[str], status: Optional[str], days: int) -> str:
+    return f"export:{kind}:{company_id}:{status}:{days}"
+
+
+async def _get_cached_export(key: str) -> Optional[bytes]:
+    """Cached export bytes, or None on a miss. Redis errors count as misses."""
+    if not _export_cache_enabled():
+        return None
+    try:
+        return await get_redis().get(key)
+    except RedisError:
+        logger.warning("Export cache read failed", exc_info=True)
+        return None
+
+
+async def _set_cached_export(key: str, content: bytes):
+    try:
+        await get_redis().set(key, content, ex=settings.export_cache_ttl)
+    except RedisError:
+        logger.warning("Export cache write failed", exc_info=True)
+
+
+async def _cache_stream(chunks: Iterator[Union[str, bytes]], key: str) -> AsyncIterator[bytes]:
+    """
+    Pass chunks through while keeping a copy, then cache it once complete.
+    
+    The sync iterator still runs in the threadpool. Exports over the
+    configured size stop being copied and are not cached.
+    """
+    limit = _export_cache_max_bytes()
+    parts: Optional[List[bytes]] = []
+    size = 0
+    
+    async for chunk in iterate_in_threadpool(chunks):
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if parts is not None:
+            size += len(chunk)
+            if size <= limit:
+                parts.append(chunk)
+            else:
+                parts = None
+        yield chunk
+    
+    if parts is not None:
+        await _set_cached_export(key, b"".join(parts))
+
+
+def _iter_file(file) -> Iterator[bytes]:
+    """Read a file in chunks, closing it when done."""
+    with file:
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def _filter_recent(query, days: int):
+    """
+    Restrict to documents created in the last `days` days.
+    
+    Both bounds are plain comparisons on the bare created_at column so the
+    planner can use a range scan on the export index.
+    """
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+    return query.filter(
+        Document.created_at >= start_date,
+        Document.created_at <= end_date,
+    )
+
+
+def _iter_csv(rows: Iterable[list]) -> Iterator[str]:
+    """Encode rows as CSV one line at a time, reusing a single buffer."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def _iter_json_export(documents: Iterable[RowMapping], filters: dict) -> Iterator[bytes]:
+    """
+    Encode the JSON export one document at a time.
+    
+    The envelope is written around the documents array, with
+    total_documents emitted last since it is only known at the end.
+    """
+    yield b'{"exported_at":' + orjson.dumps(datetime.utcnow(), option=orjson.OPT_NAIVE_UTC)
+    yield b',"filters":' + orjson.dumps(filters) + b',"documents":['
+    
+    total = 0
+    for doc in documents:
+        if total:
+            yield b","
+        yield orjson.dumps(dict(doc), option=orjson.OPT_NAIVE_UTC)
+        total += 1
+    
+    yield b'],"total_documents":' + str(total).encode() + b"}"
+
+
+def _spreadsheet_row(doc: Row, created_at: str) -> list:
+    """
+    One CSV/Excel data row, in SPREADSHEET_COLUMNS header order.
+    
+    created_at is passed pre-formatted since the two exports differ.
+    """
+    extracted = doc.extracted_data or {}
+    get = extracted.get
+    
+    return [
+        doc.id,
+        doc.filename,
+        created_at,
+        doc.status,
+        doc.document_type or "",
+        get("vendor", ""),
+        get("total_amount", ""),
+        get("date", ""),
+        get("category_suggestion", ""),
+        doc.qbo_id or "",
+        doc.qbo_sync_status or "",
+    ]
+
+
+def _excel_rows(documents: Iterable[Row]) -> Iterator[list]:
+    """One flat row per document for the Excel export (header written separately)."""
+    for doc in documents:
+        created_at = doc.created_at.strftime("%Y-%m-%d %H:%M") if doc.created_at else ""
+        yield _spreadsheet_row(doc, created_at)
+
+
+def _get_excel_writer():
+    """Pick the fastest installed .xlsx writer, or None if there is none."""
+    try:
+        import xlsxwriter  # noqa: F401
+        return _write_excel_xlsxwriter
+    except ImportError:
+        pass
+    
+    try:
+        import openpyxl  # noqa: F401
+        return _write_excel_openpyxl
+    except ImportError:
+        return None
+
+
+def _write_excel_xlsxwriter(output, rows: Iterable[list]):
+    """
+    Write the Receipts sheet with xlsxwriter.
+    
+    constant_memory flushes each row to a temp file as soon as the next
+    one starts, so memory stays flat however many documents are exported.
+    """
+    import xlsxwriter
+    
+    wb = xlsxwriter.Workbook(output, {"constant_memory": True})
+    ws = wb.add_worksheet("Receipts")
+    header_format = wb.add_format({"bold": True, "font_color": "#FFFFFF", "bg_color": "#3B82F6"})
+    
+    for col, (header, width) in enumerate(EXCEL_COLUMNS):
+        ws.set_column(col, col, width)
+        ws.write_string(0, col, header, header_format)
     
-    documents = query.all()
+    for row_num, row in enumerate(rows, 1):
+        ws.write_row(row_num, 0, row)
     
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Receipts"
+    wb.close()
+
+
+def _write_excel_openpyxl(output, rows: Iterable[list]):
+    """Write the Receipts sheet with an openpyxl write-only workbook."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+    
+    # Write-only workbook: rows go straight to the XML stream
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Receipts")
     
     # Header styling
     header_fill = PatternFill(start_color="3b82f6", end_color="3b82f6", fill_type="solid")
     header_font = Font(color="FFFFFF", bold=True)
     
-    # Headers
-    headers = [
-        "ID", "Filename", "Upload Date", "Status", "Document Type",
-        "Vendor", "Amount", "Date", "Category", "QBO ID", "QBO Status"
-    ]
+    # Column widths must be set before any rows are written
+    for col, (_, width) in enumerate(EXCEL_COLUMNS, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
     
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
+    # Headers
+    header_row = []
+    for header, _ in EXCEL_COLUMNS:
+        cell = WriteOnlyCell(ws, value=header)
         cell.fill = header_fill
         cell.font = header_font
+        header_row.append(cell)
+    ws.append(header_row)
     
     # Data rows
-    for row, doc in enumerate(documents, 2):
-        extracted = doc.extracted_data or {}
-        
-        ws.cell(row=row, column=1, value=doc.id)
-        ws.cell(row=row, column=2, value=doc.filename)
-        ws.cell(row=row, column=3, value=doc.created_at.strftime("%Y-%m-%d %H:%M") if doc.created_at else "")
-        ws.cell(row=row, column=4, value=doc.status)
-        ws.cell(row=row, column=5, value=doc.document_type or "")
-        ws.cell(row=row, column=6, value=extracted.get("vendor", ""))
-        ws.cell(row=row, column=7, value=extracted.get("total_amount", ""))
-        ws.cell(row=row, column=8, value=extracted.get("date", ""))
-        ws.cell(row=row, column=9, value=extracted.get("category_suggestion", ""))
-        ws.cell(row=row, column=10, value=doc.qbo_id or "")
-        ws.cell(row=row, column=11, value=doc.qbo_sync_status or "")
-    
-    # Auto-size columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            if cell.value:
-                max_length = max(max_length, len(str(cell.value)))
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
-    
-    # Save to bytes
-    output = io.BytesIO()
+    for row in rows:
+        ws.append(row)
+    
     wb.save(output)
-    output.seek(0)
+
+
+def _csv_export_rows(documents: Iterable[Row]) -> Iterator[list]:
+    """Header plus one flat row per document for the CSV export."""
+    yield [
+        "ID",
+        "Filename",
+        "Upload Date",
+        "Status",
+        "Document Type",
+        "Vendor",
+        "Amount",
+        "Date",
+        "Category",
+        "QBO ID",
+        "QBO Status",
+    ]
     
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=receipt-ai-export-{datetime.now().strftime('%Y%m%d')}.xlsx"
-        },
-    )
+    for doc in documents:
+        yield _spreadsheet_row(doc, doc.created_at.isoformat())
+
+
+def _qbo_import_lines(documents: Iterable[Row]) -> Iterator[str]:
+    """Header lines plus a TRNS/SPL pair per receipt, in QuickBooks IIF format."""
+    yield IIF_TRNS_HEADER
+    yield IIF_SPL_HEADER
+    
+    default_date = datetime.now().strftime("%m/%d/%Y")
+    
+    for doc in documents:
+        extracted = doc.extracted_data or {}
+        
+        fields = {
+            "date": _iif_field(extracted.get("date", default_date)),
+            "vendor": _iif_field(extracted.get("vendor", "Unknown Vendor")),
+            "amount": _iif_field(extracted.get("total_amount", 0)),
+            "filename": _iif_field(doc.filename),
+            "notes": _iif_field(extracted.get("notes", "")),
+            "category": _iif_field(extracted.get("category_suggestion", "Expenses")),
+        }
+        
+        # Transaction row, then split row (expense account)
+        yield IIF_TRNS_ROW.format_map(fields)
+        yield IIF_SPL_ROW.format_map(fields)
+
+
+def _iif_field(value) -> str:
+    """Stringify a value, replacing tabs/newlines that would break the row."""
+    return str(value).translate(_IIF_SANITIZE)
@@ -7,19 +7,40 @@ Supports:
 - Custom webhook triggers
 """
 
+import asyncio
+import binascii
 import hashlib
 import hmac
-from typing import Optional, List
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Optional, List
 from fastapi import APIRouter, Request, HTTPException, Header, Depends
 from pydantic import BaseModel, EmailStr, HttpUrl
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from celery import group
+import httpx
 
-from app.core.config import settings
-from app.core.database import get_db
+from app.core.config import WEBHOOK_SECRET
+from app.core.database import get_async_db
+from app.models.database import Document
+from app.services.storage.storage import StorageService, UPLOAD_CHUNK_SIZE
 from app.tasks.extraction import extract_document
 
 router = APIRouter()
 
+# Attachment / file URL downloads
+ATTACHMENT_TIMEOUT = 30.0
+ATTACHMENT_MAX_CONNECTIONS = 16
+ATTACHMENT_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+
+@dataclass
+class _StoredDownload:
+    """A downloaded file, already in storage."""
+    storage_key: str
+    content_type: str
+    file_size: int
+
 
 class WebhookPayload(BaseModel):
     """Generic webhook payload."""
@@ -43,26 +64,40 @@ class ZapierWebhookPayload(BaseModel):
     metadata: Optional[dict] = None
 
 
+_hmac_prototypes: Dict[str, "hmac.HMAC"] = {}
+
+
+def _hmac_prototype(secret: str) -> "hmac.HMAC":
+    """Keyed HMAC context per secret; copies skip re-running the key setup."""
+    prototype = _hmac_prototypes.get(secret)
+    if prototype is None:
+        prototype = hmac.new(secret.encode(), None, hashlib.sha256)
+        _hmac_prototypes[secret] = prototype
+    return prototype
+
+
 def verify_webhook_signature(
     payload: bytes,
     signature: str,
     secret: str,
 ) -> bool:
     """Verify HMAC signature for webhook security."""
-    expected = hmac.new(
-        secret.encode(),
-        payload,
-        hashlib.sha256,
-    ).hexdigest()
+    try:
+        signature_bytes = binascii.unhexlify(signature)
+    except (binascii.Error, ValueError):
+        return False
+    
+    ctx = _hmac_prototype(secret).copy()
+    ctx.update(payload)
     
-    return hmac.compare_digest(signature, expected)
+    return hmac.compare_digest(signature_bytes, ctx.digest())
 
 
 @router.post("/email")
 async def email_webhook(
     request: Request,
     payload: EmailWebhookPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_signature: Optional[str] = Header(None),
 ):
     """
@@ -79,51 +114,66 @@ async def email_webhook(
     - Postmark Inbound
     """
     # Verify signature if configured
-    if settings.webhook_secret and x_signature:
+    if WEBHOOK_SECRET and x_signature:
         body = await request.body()
-        if not verify_webhook_signature(body, x_signature, settings.webhook_secret):
+        if not verify_webhook_signature(body, x_signature, WEBHOOK_SECRET):
             raise HTTPException(status_code=403, detail="Invalid signature")
     
-    # Process attachments
-    from app.services.storage.storage import StorageService
-    import httpx
-    
+    # Download and store all attachments concurrently over one connection pool
     storage = StorageService()
-    document_ids = []
+    async with httpx.AsyncClient(
+        timeout=ATTACHMENT_TIMEOUT,
+        limits=httpx.Limits(max_connections=ATTACHMENT_MAX_CONNECTIONS),
+    ) as client:
+        results = await asyncio.gather(
+            *(
+                _download_attachment(
+                    client,
+                    storage,
+                    attachment["url"],
+                    attachment["filename"],
+                    content_type=attachment.get("content_type"),
+                )
+                for attachment in payload.attachments
+            ),
+            return_exceptions=True,
+        )
     
-    for attachment in payload.attachments:
-        # Download attachment
-        async with httpx.AsyncClient() as client:
-            response = await client.get(attachment["url"])
-            file_data = response.content
-        
-        # Store file
-        storage_path = storage.store_file(
-            file_data=file_data,
-            filename=attachment["filename"],
+    # All or nothing: if any attachment failed, remove the ones already stored
+    failed = [
+        attachment["filename"]
+        for attachment, result in zip(payload.attachments, results)
+        if isinstance(result, BaseException)
+    ]
+    if failed:
+        await asyncio.gather(*(
+            asyncio.to_thread(storage.delete_file, result.storage_key)
+            for result in results
+            if not isinstance(result, BaseException)
+        ))
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed to download attachments: {', '.join(failed)}",
         )
-        
-        # Create document record
-        from app.models.database import Document
-        doc = Document(
+    
+    # Create all document records in one transaction
+    docs = [
+        Document(
             filename=attachment["filename"],
-            file_type=attachment.get("content_type", "application/octet-stream"),
-            storage_path=storage_path,
+            content_type=attachment.get("content_type", "application/octet-stream"),
+            storage_key=download.storage_key,
             status="uploaded",
-            source="email",
-            metadata={
-                "from_email": payload.from_email,
-                "subject": payload.subject,
-            },
+            company_id="default",
         )
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
-        
-        # Trigger extraction
-        extract_document.delay(doc.id)
-        
-        document_ids.append(doc.id)
+        for attachment, download in zip(payload.attachments, results)
+    ]
+    db.add_all(docs)
+    await db.commit()
+    document_ids = [doc.id for doc in docs]  # expire_on_commit=False keeps these loaded
+    
+    # Trigger extraction in a single publish
+    if document_ids:
+        group(extract_document.s(doc_id) for doc_id in document_ids).apply_async()
     
     return {
         "status": "success",
@@ -132,10 +182,49 @@ async def email_webhook(
     }
 
 
+async def _download_attachment(
+    client: httpx.AsyncClient,
+    storage: StorageService,
+    url: str,
+    filename: str,
+    company_id: str = "default",
+    content_type: Optional[str] = None,
+) -> _StoredDownload:
+    """
+    Stream a file from a URL into storage.
+    
+    The body is spooled chunk by chunk (to disk past a few MB) rather than
+    buffered whole, then handed to storage off the event loop. Without a
+    content_type, the one the server sent is used.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_MAX_SIZE) as spool:
+        async with client.stream("GET", url) as response:
+            # Don't store an error page as a document
+            response.raise_for_status()
+            if content_type is None:
+                content_type = response.headers.get(
+                    "content-type", "application/octet-stream"
+                ).split(";")[0].strip()
+            async for chunk in response.aiter_bytes(UPLOAD_CHUNK_SIZE):
+                spool.write(chunk)
+        
+        file_size = spool.tell()
+        spool.seek(0)
+        storage_key = await asyncio.to_thread(
+            storage.store_stream,
+            spool,
+            filename=filename,
+            company_id=company_id,
+            content_type=content_type,
+        )
+    
+    return _StoredDownload(storage_key=storage_key, content_type=content_type, file_size=file_size)
+
+
 @router.post("/zapier")
 async def zapier_webhook(
     payload: ZapierWebhookPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Zapier integration webhook.
@@ -146,38 +235,36 @@ async def zapier_webhook(
     - Sends file URL to this endpoint
     - We download, process, and extract
     """
-    import httpx
-    from app.services.storage.storage import StorageService
-    from app.models.database import Document
+    company_id = payload.company_id or "default"
     
-    # Download file
-    async with httpx.AsyncClient() as client:
-        response = await client.get(str(payload.file_url))
-        file_data = response.content
-    
-    # Store
+    # Download straight into storage, without holding the file in memory
     storage = StorageService()
-    storage_path = storage.store_file(
-        file_data=file_data,
-        filename=payload.filename,
-    )
+    async with httpx.AsyncClient(timeout=ATTACHMENT_TIMEOUT) as client:
+        try:
+            download = await _download_attachment(
+                client,
+                storage,
+                str(payload.file_url),
+                payload.filename,
+                company_id=company_id,
+            )
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"File download failed with status {e.response.status_code}",
+            )
     
     # Create document
     doc = Document(
         filename=payload.filename,
-        file_type=response.headers.get("content-type", "application/octet-stream"),
-        storage_path=storage_path,
+        content_type=download.content_type,
+        file_size=download.file_size,
+        storage_key=download.storage_key,
         status="uploaded",
-        source="zapier",
-        metadata=payload.metadata or {},
+        company_id=company_id,
     )
-    
-    if payload.company_id:
-        doc.company_id = payload.company_id
-    
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    await db.commit()
     
     # Extract
     task = extract_document.delay(doc.id)
@@ -202,9 +289,9 @@ async def generic_webhook(
     Supports any event type. Processes based on event name.
     """
     # Verify signature
-    if settings.webhook_secret and x_signature:
+    if WEBHOOK_SECRET and x_signature:
         body = await request.body()
-        if not verify_webhook_signature(body, x_signature, settings.webhook_secret):
+        if not verify_webhook_signature(body, x_signature, WEBHOOK_SECRET):
             raise HTTPException(status_code=403, detail="Invalid signature")
     
     # Route based on event type
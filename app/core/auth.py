@@ -2,9 +2,14 @@
 Authentication and authorization for API.
 """
 
+import hmac
+import inspect
 import secrets
 import hashlib
-from typing import Optional
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Optional
 from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException, Security, status
@@ -12,9 +17,11 @@ from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredenti
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from redis.asyncio import Redis
 
-from app.core.config import settings
+from app.core.config import settings, SECRET_KEY, API_KEY_HASH_SECRET, RATE_LIMIT_PER_MINUTE
 from app.core.database import get_db
+from app.core.redis_client import get_redis
 
 
 # Password hashing
@@ -36,11 +43,48 @@ def generate_api_key() -> str:
     return secrets.token_urlsafe(32)
 
 
+# BLAKE2b keys are at most 64 bytes; derive one from the configured secret
+_API_KEY_HASH_KEY = (
+    hashlib.blake2b(API_KEY_HASH_SECRET.encode()).digest() if API_KEY_HASH_SECRET else None
+)
+
+
 def hash_api_key(api_key: str) -> str:
-    """Hash an API key for storage."""
+    """
+    Hash an API key for storage.
+    
+    Keyed BLAKE2b (32 hex chars) when API_KEY_HASH_SECRET is set, otherwise
+    the legacy unkeyed SHA-256 (64 hex chars).
+    """
+    if _API_KEY_HASH_KEY is None:
+        return _legacy_hash_api_key(api_key)
+    return hashlib.blake2b(api_key.encode(), digest_size=16, key=_API_KEY_HASH_KEY).hexdigest()
+
+
+def _legacy_hash_api_key(api_key: str) -> str:
+    """Unkeyed SHA-256 hash used before keyed hashing was introduced."""
     return hashlib.sha256(api_key.encode()).hexdigest()
 
 
+def verify_api_key_hash(api_key: str, stored_hash: str) -> bool:
+    """
+    Check an API key against a stored hash, in either format.
+    
+    Legacy SHA-256 hashes keep working during the transition; use
+    api_key_needs_rehash to replace them on the next successful check.
+    """
+    if len(stored_hash) == 64:
+        expected = _legacy_hash_api_key(api_key)
+    else:
+        expected = hash_api_key(api_key)
+    return hmac.compare_digest(expected, stored_hash)
+
+
+def api_key_needs_rehash(stored_hash: str) -> bool:
+    """Whether a stored hash predates the current hashing scheme."""
+    return _API_KEY_HASH_KEY is not None and len(stored_hash) == 64
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -61,7 +105,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=15)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     return encoded_jwt
 
@@ -69,12 +113,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def verify_token(token: str) -> Optional[dict]:
     """Verify and decode a JWT token."""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
 
 
+@lru_cache(maxsize=1)
+def _valid_key_hashes() -> frozenset:
+    """Hashes of the configured API keys, computed once."""
+    return frozenset(hash_api_key(k) for k in getattr(settings, "api_keys", []))
+
+
 async def get_api_key(api_key: str = Security(api_key_header)) -> str:
     """
     Validate API key from header.
@@ -92,10 +142,9 @@ async def get_api_key(api_key: str = Security(api_key_header)) -> str:
         )
     
     # TODO: Verify against database
-    # For now, check against config (development only)
-    valid_keys = getattr(settings, "api_keys", [])
-    
-    if api_key not in valid_keys:
+    # For now, check against config (development only).
+    # Only hashes are compared, so lookup time says nothing about the raw key.
+    if hash_api_key(api_key) not in _valid_key_hashes():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API key",
@@ -162,6 +211,14 @@ class OptionalAuth:
             return None
 
 
+def _rate_limit_exceeded(max_requests: int, window_seconds: int) -> HTTPException:
+    """429 error raised by the rate limiters."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Rate limit exceeded. Max {max_requests} requests per {window_seconds}s.",
+    )
+
+
 # Rate limiting (simple in-memory implementation)
 class RateLimiter:
     """
@@ -179,33 +236,28 @@ class RateLimiter:
     def __init__(self, max_requests: int = 60, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = {}  # key -> [(timestamp, count)]
+        # key -> monotonic timestamps of the last max_requests allowed requests, oldest first
+        self.requests: Dict[str, deque] = {}
     
     def check(self, key: str):
         """Check if request is allowed. Raises HTTPException if rate limit exceeded."""
-        now = datetime.utcnow()
+        if self.max_requests <= 0:
+            # Nothing is allowed (and a zero-length deque has no oldest entry)
+            raise _rate_limit_exceeded(self.max_requests, self.window_seconds)
         
-        # Clean old requests
-        if key in self.requests:
-            self.requests[key] = [
-                (ts, count) for ts, count in self.requests[key]
-                if (now - ts).total_seconds() < self.window_seconds
-            ]
-        
-        # Count requests in window
-        if key not in self.requests:
-            self.requests[key] = []
+        now = time.monotonic()
+        timestamps = self.requests.get(key)
+        if timestamps is None:
+            timestamps = self.requests[key] = deque(maxlen=self.max_requests)
         
-        request_count = sum(count for _, count in self.requests[key])
-        
-        if request_count >= self.max_requests:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Max {self.max_requests} requests per {self.window_seconds}s.",
-            )
+        # Only a full window can be over the limit: compare against the
+        # oldest of the last max_requests requests. Appending to a full
+        # deque evicts that oldest entry.
+        if len(timestamps) == self.max_requests and now - timestamps[0] < self.window_seconds:
+            raise _rate_limit_exceeded(self.max_requests, self.window_seconds)
         
         # Add this request
-        self.requests[key].append((now, 1))
+        timestamps.append(now)
     
     def reset(self, key: str):
         """Reset rate limit for a key."""
@@ -213,8 +265,73 @@ class RateLimiter:
             del self.requests[key]
 
 
-# Global rate limiter instance
-global_rate_limiter = RateLimiter(
-    max_requests=settings.rate_limit_per_minute,
-    window_seconds=60,
-)
+class RedisRateLimiter:
+    """
+    Fixed-window rate limiter backed by Redis.
+    
+    One counter per key per window (INCR + EXPIRE in a single pipeline),
+    so limits are O(1) per request and shared across all workers.
+    
+    Usage:
+        limiter = RedisRateLimiter(get_redis(), max_requests=10, window_seconds=60)
+        
+        @router.get("/")
+        async def route(api_key: str = Depends(get_api_key)):
+            await limiter.check(api_key)
+            ...
+    """
+    
+    def __init__(self, redis: Redis, max_requests: int = 60, window_seconds: int = 60):
+        self.redis = redis
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+    
+    def _bucket_key(self, key: str) -> str:
+        bucket = int(time.time()) // self.window_seconds
+        return f"rl:{key}:{bucket}"
+    
+    async def check(self, key: str):
+        """Check if request is allowed. Raises HTTPException if rate limit exceeded."""
+        bucket_key = self._bucket_key(key)
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.incr(bucket_key)
+            pipe.expire(bucket_key, self.window_seconds * 2)
+            request_count, _ = await pipe.execute()
+        
+        if request_count > self.max_requests:
+            raise _rate_limit_exceeded(self.max_requests, self.window_seconds)
+    
+    async def reset(self, key: str):
+        """Reset rate limit for a key."""
+        await self.redis.delete(self._bucket_key(key))
+
+
+# Global rate limiter instance: shared via Redis when configured,
+# otherwise per-process (development)
+if settings.redis_url:
+    global_rate_limiter = RedisRateLimiter(
+        get_redis(),
+        max_requests=RATE_LIMIT_PER_MINUTE,
+        window_seconds=60,
+    )
+else:
+    global_rate_limiter = RateLimiter(
+        max_requests=RATE_LIMIT_PER_MINUTE,
+        window_seconds=60,
+    )
+
+
+async def rate_limit(api_key: str = Depends(get_api_key)) -> str:
+    """
+    Dependency that validates the API key and applies the global rate limit.
+    
+    Usage:
+        @router.get("/")
+        async def route(api_key: str = Depends(rate_limit)):
+            ...
+    """
+    result = global_rate_limiter.check(api_key)
+    if inspect.isawaitable(result):
+        await result
+    return api_key
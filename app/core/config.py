@@ -17,12 +17,18 @@ class Settings(BaseSettings):
     app_env: Literal["development", "staging", "production"] = "development"
     debug: bool = True
     secret_key: str = "change-me-in-production"
+    api_key_hash_secret: Optional[str] = None  # Keys API key hashes; unset keeps plain SHA-256
     
     # API
     api_prefix: str = "/api"
     
     # Database (for future use)
     database_url: Optional[str] = None
+    db_pool_size: int = 10  # Per engine, per process
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_pool_pre_ping: bool = True  # Turn off behind PgBouncer transaction pooling
+    db_pool_recycle: int = 1800  # Seconds; use ~60 behind PgBouncer
     
     # Redis (for Celery background tasks)
     redis_url: Optional[str] = None
@@ -64,6 +70,14 @@ class Settings(BaseSettings):
     # Rate limiting
     rate_limit_per_minute: int = 60
     
+    # Analytics
+    analytics_cache_ttl: float = 10.0  # Seconds; 0 disables caching
+    analytics_event_log_sample_rate: float = 1.0  # Fraction of tracked events that are logged
+    
+    # Exports
+    export_cache_ttl: int = 120  # Seconds; 0 disables caching (needs Redis)
+    export_cache_max_mb: int = 20  # Larger exports are streamed but not cached
+    
     # Document processing
     max_file_size_mb: int = 50
     max_pages_per_document: int = 100
@@ -97,3 +111,9 @@ def get_settings() -> Settings:
 
 # Convenience alias
 settings = get_settings()
+
+# Hot-path values bound once; read on every auth/webhook call
+SECRET_KEY = settings.secret_key
+API_KEY_HASH_SECRET = settings.api_key_hash_secret
+WEBHOOK_SECRET = settings.webhook_secret
+RATE_LIMIT_PER_MINUTE = settings.rate_limit_per_minute
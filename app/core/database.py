@@ -2,21 +2,56 @@
 Database connection and session management.
 """
 
-from typing import Generator
-from contextlib import contextmanager
+from typing import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
 from app.models.database import Base
 
 
+DATABASE_URL = settings.database_url or "sqlite:///./receipt_ai.db"
+
+
+def _async_database_url(url: str) -> str:
+    """Map a sync database URL to its async driver."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def _pool_size_options(url: str) -> dict:
+    """QueuePool sizing for both engines (SQLite's default pools don't take it)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+
 # Create engine
 engine = create_engine(
-    settings.database_url or "sqlite:///./receipt_ai.db",
+    DATABASE_URL,
+    echo=settings.debug,
+    pool_pre_ping=settings.db_pool_pre_ping,  # Verify connections before using
+    pool_recycle=settings.db_pool_recycle,
+    **_pool_size_options(DATABASE_URL),
+)
+
+# Async engine for request handlers that shouldn't block the event loop
+async_engine = create_async_engine(
+    _async_database_url(DATABASE_URL),
     echo=settings.debug,
-    pool_pre_ping=True,  # Verify connections before using
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    **_pool_size_options(DATABASE_URL),
 )
 
 # Session factory
@@ -27,6 +62,14 @@ SessionLocal = sessionmaker(
 )
 
 
+# Async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency for FastAPI routes.
@@ -43,6 +86,19 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async dependency for FastAPI routes.
+    
+    Usage:
+        @app.get("/items")
+        async def read_items(db: AsyncSession = Depends(get_async_db)):
+            ...
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """
@@ -63,6 +119,24 @@ def get_db_session() -> Generator[Session, None, None]:
         db.close()
 
 
+@asynccontextmanager
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async context manager for database sessions.
+    
+    Usage:
+        async with get_async_db_session() as db:
+            await db.execute(select(User))
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
 def init_db():
     """
     Initialize database tables.
@@ -0,0 +1,102 @@
+"""
+Short-lived in-process cache for analytics/metrics responses.
+
+Dashboards poll the analytics endpoints with identical parameters; caching
+for a few seconds collapses those polls into one aggregation per TTL window.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """Thread-safe key -> value cache with per-entry expiry."""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+    
+    def _get_fresh(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return True, entry[1]
+        return False, None
+    
+    def get_or_compute(self, key: Hashable, ttl: float, fn: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing it with fn() if missing or expired.
+        
+        Args:
+            key: Cache key, e.g. ("summary", hours)
+            ttl: Seconds the computed value stays fresh (<= 0 disables caching)
+            fn: Zero-argument callable producing the value
+        """
+        if ttl <= 0:
+            return fn()
+        
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+            
+            value = fn()
+            self._entries[key] = (now + ttl, value)
+            return value
+    
+    async def get_or_compute_async(
+        self,
+        key: Hashable,
+        ttl: float,
+        fn: Callable[[], Any],
+    ) -> Any:
+        """
+        Async variant of get_or_compute that coalesces concurrent misses.
+        
+        The first caller runs fn() in the default executor (tracker calls are
+        sync); callers arriving while it is in flight await the same future
+        instead of recomputing.
+        """
+        hit, value = self._get_fresh(key)
+        if hit:
+            return value
+        
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Shield so a cancelled waiter doesn't cancel the shared computation
+            return await asyncio.shield(pending)
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        
+        try:
+            value = await loop.run_in_executor(None, fn)
+            
+            if ttl > 0:
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + ttl, value)
+            
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved in case nobody else was waiting
+            raise
+        finally:
+            self._pending.pop(key, None)
+            if not future.done():
+                future.cancel()
+    
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Global cache for analytics endpoints
+metrics_cache = TTLCache()
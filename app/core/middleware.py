@@ -2,106 +2,106 @@
 Custom middleware for FastAPI.
 """
 
+import itertools
+import re
+import secrets
 import time
-import uuid
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.config import settings
 from app.core.logging import set_request_context, clear_request_context, log_api_request
 
+# Request IDs: per-process random prefix + counter (unique without per-request randomness)
+_PROC_NONCE = secrets.token_hex(4)
+_request_counter = itertools.count(1)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log all API requests with timing and context."""
+# Proxy-supplied request IDs are echoed in headers and logs, so only plain
+# IDs of bounded length (UUIDs, hex tokens) are trusted
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+# Static security headers, as raw ASGI byte pairs built once at import
+_RESPONSE_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+]
+if settings.is_production:
+    # Only add HSTS in production
+    _RESPONSE_HEADERS.append(
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains")
+    )
+
+
+class RequestMiddleware:
+    """
+    Request logging and security headers in a single ASGI pass.
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate request ID
-        request_id = str(uuid.uuid4())
+    Replaces two BaseHTTPMiddleware layers, each of which ran the
+    request in an extra task and piped the response body through a
+    memory stream. Here headers are added to the http.response.start
+    message on its way out and the body is passed through untouched.
+    CORS stays with Starlette's CORSMiddleware (see app.main).
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Set context
-        set_request_context(request_id)
+        # Reuse the proxy's request ID if it sent a valid one, otherwise generate one
+        request_id = Headers(scope=scope).get("x-request-id")
+        if request_id is None or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = f"{_PROC_NONCE}-{next(_request_counter):x}"
         
-        # Add request ID to request state
-        request.state.request_id = request_id
+        # Set context and expose the ID as request.state.request_id
+        set_request_context(request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
         
         # Start timer
         start_time = time.time()
+        status_code = 500
+        
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.time() - start_time) * 1000
+                
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", request_id.encode()))
+                headers.append((b"x-process-time", f"{duration_ms:.2f}ms".encode()))
+                headers.extend(_RESPONSE_HEADERS)
+                message["headers"] = headers
+            
+            await send(message)
         
-        # Process request
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
             # Log error
-            duration_ms = (time.time() - start_time) * 1000
             log_api_request(
-                method=request.method,
-                path=request.url.path,
+                method=scope["method"],
+                path=scope["path"],
                 status_code=500,
-                duration_ms=duration_ms,
+                duration_ms=(time.time() - start_time) * 1000,
                 error=str(e),
             )
+            clear_request_context()
             raise
         
-        # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
-        
         # Log request
         log_api_request(
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-            duration_ms=duration_ms,
+            method=scope["method"],
+            path=scope["path"],
+            status_code=status_code,
+            duration_ms=(time.time() - start_time) * 1000,
         )
         
-        # Add headers
-        response.headers["X-Request-ID"] = request_id
-        response.headers["X-Process-Time"] = f"{duration_ms:.2f}ms"
-        
         # Clear context
         clear_request_context()
-        
-        return response
-
-
-class CORSMiddleware(BaseHTTPMiddleware):
-    """Custom CORS middleware with more control."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Handle preflight
-        if request.method == "OPTIONS":
-            return Response(
-                status_code=200,
-                headers={
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-API-Key",
-                    "Access-Control-Max-Age": "3600",
-                },
-            )
-        
-        response = await call_next(request)
-        
-        # Add CORS headers
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        
-        return response
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to responses."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        # Only add HSTS in production
-        from app.core.config import settings
-        if settings.is_production:
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        return response
@@ -0,0 +1,15 @@
+"""
+Shared async Redis client.
+"""
+
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> Redis:
+    """Shared async Redis client (connection pool) for the configured URL."""
+    return Redis.from_url(settings.redis_url)
@@ -2,23 +2,58 @@
 Receipt AI - Document processor for QuickBooks Online
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+from app.core.middleware import RequestMiddleware
+from app.core.responses import ORJSONResponse
+from app.core.config import settings
 from app.api import documents, health, qbo, webhooks, analytics, batch, export
+from app.services.analytics.tracker import tracker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background tasks."""
+    # Parse and compile the UI template up front, not on the first request
+    templates.get_template("index.html")
+    
+    snapshot_task = asyncio.create_task(tracker.run_snapshot_refresh())
+    yield
+    snapshot_task.cancel()
+
 
 app = FastAPI(
     title="Receipt AI",
     description="AI-powered receipt and document processor for QuickBooks Online",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# CORS
+# Compress large JSON (batch status, extracted line items); small bodies pass through.
+# .xlsx exports are already deflated zips, so they are sent as-is.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=1024,
+    compresslevel=4,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + (export.EXCEL_MEDIA_TYPE,),
+)
+
+# Request logging and security headers (timing covers everything below)
+app.add_middleware(RequestMiddleware)
+
+# CORS (outermost: answers preflight requests before they reach the app)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure for production
@@ -27,9 +62,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Templates
+# Templates: compiled once and cached; only re-checked on disk outside production
 templates_dir = Path(__file__).parent / "templates"
-templates = Jinja2Templates(directory=str(templates_dir))
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader(templates_dir),
+    autoescape=select_autoescape(),
+    auto_reload=not settings.is_production,
+    cache_size=-1,
+))
 
 # Routes
 app.include_router(health.router, tags=["Health"])
@@ -44,7 +84,7 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"]
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Serve the web UI."""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 
 @app.get("/api")
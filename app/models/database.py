@@ -7,14 +7,15 @@ Uses SQLAlchemy for ORM with PostgreSQL.
 from datetime import datetime
 from typing import Optional, List
 from decimal import Decimal
-import uuid
 
 from sqlalchemy import (
     Column, String, Integer, Float, Boolean, DateTime,
-    ForeignKey, Text, Enum, JSON, Numeric
+    ForeignKey, Text, Enum, JSON, Numeric, Index, text
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql.expression import FunctionElement
 
 from app.schemas.documents import DocumentType, ProcessingStatus
 
@@ -22,8 +23,30 @@ from app.schemas.documents import DocumentType, ProcessingStatus
 Base = declarative_base()
 
 
-def generate_uuid():
-    return str(uuid.uuid4())
+class gen_random_uuid(FunctionElement):
+    """
+    Server-side UUID v4 for primary key defaults.
+    
+    IDs are generated by the database, so inserts (bulk ones especially)
+    don't pay for uuid4() in Python; the ORM reads them back via RETURNING.
+    """
+    type = String()
+    inherit_cache = True
+
+
+@compiles(gen_random_uuid, "postgresql")
+def _gen_random_uuid_postgresql(element, compiler, **kw):
+    return "gen_random_uuid()"
+
+
+@compiles(gen_random_uuid)
+def _gen_random_uuid_default(element, compiler, **kw):
+    # SQLite (development): UUID v4 as the 32 hex chars the Uuid type stores there
+    return (
+        "(lower(hex(randomblob(6)) || '4' || substr(hex(randomblob(2)), 2) || "
+        "substr('89ab', 1 + (abs(random()) % 4), 1) || "
+        "substr(hex(randomblob(2)), 2) || hex(randomblob(6))))"
+    )
 
 
 class Company(Base):
@@ -33,7 +56,7 @@ class Company(Base):
     """
     __tablename__ = "companies"
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     name = Column(String(255), nullable=False)
     email = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -57,7 +80,7 @@ class User(Base):
     """
     __tablename__ = "users"
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     company_id = Column(UUID(as_uuid=False), ForeignKey("companies.id"), nullable=False)
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255))
@@ -78,7 +101,7 @@ class QBOConnection(Base):
     """
     __tablename__ = "qbo_connections"
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     company_id = Column(UUID(as_uuid=False), ForeignKey("companies.id"), nullable=False)
     
     # QBO identifiers
@@ -105,20 +128,45 @@ class Document(Base):
     Uploaded document (receipt, bank statement, etc.)
     """
     __tablename__ = "documents"
-    
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    __table_args__ = (
+        # Batch status polling and push-all filter on batch_id (+ status)
+        Index("idx_documents_batch_id_status", "batch_id", "status"),
+        # Push-all only ever looks for rows not yet synced to QBO
+        Index(
+            "idx_documents_push_ready", "batch_id", "status",
+            postgresql_where=text("qbo_sync_status IS NULL"),
+            sqlite_where=text("qbo_sync_status IS NULL"),
+        ),
+        # Duplicate upload detection
+        Index("idx_documents_company_sha256", "company_id", "content_sha256", unique=True),
+        # Exports: equality on company/status, range + sort on created_at
+        Index(
+            "idx_documents_company_status_created",
+            "company_id", "status", text("created_at DESC"),
+        ),
+        # Date-only scans: exports without a company filter, old-file cleanup
+        Index("idx_documents_created_at", "created_at"),
+    )
+    
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     company_id = Column(UUID(as_uuid=False), ForeignKey("companies.id"), nullable=False)
+    batch_id = Column(UUID(as_uuid=False))  # Set for batch/ZIP uploads
     
     # File info
     filename = Column(String(255), nullable=False)
     content_type = Column(String(100))
     file_size = Column(Integer)
     storage_key = Column(String(500))  # S3/R2 path
+    content_sha256 = Column(String(64))  # Hex digest of the file bytes
     
     # Processing
     document_type = Column(String(50))  # receipt, invoice, bank_statement, check
     status = Column(String(50), default="uploaded")
     error_message = Column(Text)
+    extracted_data = Column(JSON)  # Raw extraction result (ReceiptData, BankStatementData, ...)
+    response_json = Column(Text)  # Pre-serialized ExtractionResponse for GET /extracted
+    qbo_sync_status = Column(String(50))  # None until pushed: pending, synced, failed
+    qbo_id = Column(String(50))  # QBO transaction ID once pushed
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -126,7 +174,7 @@ class Document(Base):
     
     # Relationships
     company = relationship("Company", back_populates="documents")
-    extracted_data = relationship("ExtractedData", back_populates="document", uselist=False)
+    extraction = relationship("ExtractedData", back_populates="document", uselist=False)
     transactions = relationship("ExtractedTransaction", back_populates="document")
 
 
@@ -135,8 +183,12 @@ class ExtractedData(Base):
     Extracted data from a document (receipts/invoices).
     """
     __tablename__ = "extracted_data"
+    __table_args__ = (
+        # Finding rows not yet (or recently) pushed to QBO
+        Index("idx_extracted_data_pushed_to_qbo_at", "pushed_to_qbo_at"),
+    )
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     document_id = Column(UUID(as_uuid=False), ForeignKey("documents.id"), unique=True, nullable=False)
     
     # Common fields
@@ -165,7 +217,7 @@ class ExtractedData(Base):
     pushed_to_qbo_at = Column(DateTime)
     
     # Relationships
-    document = relationship("Document", back_populates="extracted_data")
+    document = relationship("Document", back_populates="extraction")
     line_items = relationship("LineItem", back_populates="extracted_data")
 
 
@@ -175,7 +227,7 @@ class LineItem(Base):
     """
     __tablename__ = "line_items"
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     extracted_data_id = Column(UUID(as_uuid=False), ForeignKey("extracted_data.id"), nullable=False)
     
     description = Column(String(500))
@@ -193,8 +245,12 @@ class ExtractedTransaction(Base):
     Transaction extracted from a bank statement.
     """
     __tablename__ = "extracted_transactions"
+    __table_args__ = (
+        # A statement's transactions, in date order
+        Index("idx_extracted_transactions_document_date", "document_id", "date"),
+    )
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     document_id = Column(UUID(as_uuid=False), ForeignKey("documents.id"), nullable=False)
     
     # Transaction data
@@ -231,7 +287,7 @@ class AuditLog(Base):
     """
     __tablename__ = "audit_logs"
     
-    id = Column(UUID(as_uuid=False), primary_key=True, default=generate_uuid)
+    id = Column(UUID(as_uuid=False), primary_key=True, server_default=gen_random_uuid())
     company_id = Column(UUID(as_uuid=False), ForeignKey("companies.id"))
     user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"))
     
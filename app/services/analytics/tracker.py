@@ -9,16 +9,40 @@ Tracks:
 - Performance metrics
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Deque, Dict, Any, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import defaultdict, deque
+from bisect import bisect_left, bisect_right, insort
+from operator import attrgetter
+import asyncio
 import json
+import logging
+import random
+import threading
+import time
 
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger("analytics")
 
+# Samples kept per metric / timer name (oldest are dropped first)
+METRIC_HISTORY_SIZE = 10_000
+
+# Seconds a counters snapshot is served before it is rebuilt
+SNAPSHOT_MAX_AGE = 1.0
+
+
+def _history() -> Deque:
+    return deque(maxlen=METRIC_HISTORY_SIZE)
+
+
+def _sample_event_log() -> bool:
+    """Whether this event gets a log line (counters are never sampled)."""
+    rate = settings.analytics_event_log_sample_rate
+    return rate >= 1.0 or random.random() < rate
+
 
 @dataclass
 class Metric:
@@ -30,13 +54,141 @@ class Metric:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
+class _P2Quantile:
+    """
+    Streaming quantile estimate (Jain & Chlamtac's P-squared algorithm).
+    
+    Tracks five markers instead of the samples, so add() and value() are
+    O(1). Exact until five samples have been seen.
+    """
+    
+    def __init__(self, p: float):
+        self.p = p
+        self.heights: list = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+    
+    def add(self, x: float):
+        q, n = self.heights, self.positions
+        
+        if len(q) < 5:
+            insort(q, x)
+            return
+        
+        # Find the cell x falls in, stretching the end markers if needed
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = min(bisect_right(q, x) - 1, 3)
+        
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        
+        # Nudge the middle markers toward their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    # Parabolic step overshot; fall back to linear
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+    
+    def value(self) -> float:
+        if len(self.heights) < 5:
+            return self.heights[int(len(self.heights) * self.p)]
+        return self.heights[2]
+
+
+class StripedCounter:
+    """
+    Counter that threads can bump without a lock or lost updates.
+    
+    Each thread adds into its own cell (like Java's LongAdder), so `+=`
+    never races with another writer; get() sums the cells. The lock is
+    only taken the first time a thread touches the counter.
+    """
+    
+    def __init__(self):
+        self._cells: list = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def add(self, value: int = 1):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0]
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+        cell[0] += value
+    
+    def get(self) -> int:
+        return sum(cell[0] for cell in list(self._cells))
+
+
+@dataclass
+class _RunningStats:
+    """Running count/sum/min/max for one metric, updated on every sample."""
+    count: int = 0
+    total: float = 0.0
+    min: float = float("inf")
+    max: float = float("-inf")
+    
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+@dataclass
+class _TimerStats(_RunningStats):
+    """Running aggregates plus streaming p50/p95 for one timer."""
+    p50: _P2Quantile = field(default_factory=lambda: _P2Quantile(0.5))
+    p95: _P2Quantile = field(default_factory=lambda: _P2Quantile(0.95))
+    
+    def add(self, value: float):
+        super().add(value)
+        self.p50.add(value)
+        self.p95.add(value)
+
+
 class AnalyticsTracker:
     """In-memory analytics tracker (replace with proper service in production)."""
     
     def __init__(self):
-        self.metrics: List[Metric] = []
-        self.counters: Dict[str, int] = defaultdict(int)
-        self.timers: Dict[str, List[float]] = defaultdict(list)
+        self.metrics_by_name: Dict[str, Deque[Metric]] = defaultdict(_history)
+        self.metric_stats: Dict[str, _RunningStats] = defaultdict(_RunningStats)
+        self.counters: Dict[str, StripedCounter] = {}
+        # When each retained timer sample was taken, for count_since
+        self.timer_timestamps: Dict[str, Deque[datetime]] = defaultdict(_history)
+        self.timer_stats: Dict[str, _TimerStats] = defaultdict(_TimerStats)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0  # time.monotonic() of the last refresh
     
     def track_event(
         self,
@@ -44,17 +196,18 @@ class AnalyticsTracker:
         properties: Optional[Dict[str, Any]] = None,
         user_id: Optional[str] = None,
     ):
-        """Track an event."""
-        logger.info(
-            f"Event: {event_name}",
-            extra={
-                "event": event_name,
-                "properties": properties or {},
-                "user_id": user_id,
-            }
-        )
+        """Track an event (always counted; the log line may be sampled)."""
+        self.increment(event_name)
         
-        self.counters[event_name] += 1
+        if logger.isEnabledFor(logging.INFO) and _sample_event_log():
+            logger.info(
+                f"Event: {event_name}",
+                extra={
+                    "event": event_name,
+                    "properties": properties or {},
+                    "user_id": user_id,
+                }
+            )
     
     def track_metric(
         self,
@@ -71,7 +224,8 @@ class AnalyticsTracker:
             metadata=metadata or {},
         )
         
-        self.metrics.append(metric)
+        self.metrics_by_name[name].append(metric)
+        self.metric_stats[name].add(value)
         
         logger.debug(
             f"Metric: {name} = {value}",
@@ -84,59 +238,101 @@ class AnalyticsTracker:
     
     def increment(self, counter_name: str, value: int = 1):
         """Increment a counter."""
-        self.counters[counter_name] += value
+        counter = self.counters.get(counter_name)
+        if counter is None:
+            # setdefault is atomic, so racing first increments share one counter
+            counter = self.counters.setdefault(counter_name, StripedCounter())
+        counter.add(value)
+    
+    def counter_values(self) -> Dict[str, int]:
+        """Current value of every counter."""
+        return {name: counter.get() for name, counter in list(self.counters.items())}
     
     def timing(self, timer_name: str, duration_ms: float):
         """Record a timing metric."""
-        self.timers[timer_name].append(duration_ms)
-        
-        self.track_metric(
-            f"{timer_name}.duration_ms",
-            duration_ms,
-            tags={"type": "timing"},
-        )
+        self.timer_timestamps[timer_name].append(datetime.utcnow())
+        self.timer_stats[timer_name].add(duration_ms)
     
     def get_stats(self, metric_name: Optional[str] = None) -> Dict[str, Any]:
-        """Get statistics for metrics."""
+        """Get statistics for metrics (running aggregates since start/reset)."""
         if metric_name:
-            values = [m.value for m in self.metrics if m.name == metric_name]
-            if not values:
-                return {}
-            
-            return {
-                "count": len(values),
-                "sum": sum(values),
-                "avg": sum(values) / len(values),
-                "min": min(values),
-                "max": max(values),
-            }
+            stats = self.metric_stats.get(metric_name)
+            if stats is None:
+                return self._timer_metric_stats(metric_name)
+            return stats.summary()
         
         # Return all stats
         stats = {}
         
         # Counters
-        stats["counters"] = dict(self.counters)
+        stats["counters"] = self.counter_values()
         
-        # Timers
+        # Timers (running aggregates; percentiles are streaming estimates)
         stats["timers"] = {}
-        for timer_name, values in self.timers.items():
-            if values:
-                stats["timers"][timer_name] = {
-                    "count": len(values),
-                    "avg_ms": sum(values) / len(values),
-                    "min_ms": min(values),
-                    "max_ms": max(values),
-                    "p50_ms": sorted(values)[len(values) // 2],
-                    "p95_ms": sorted(values)[int(len(values) * 0.95)] if len(values) > 20 else max(values),
-                }
+        for timer_name, timer in list(self.timer_stats.items()):
+            stats["timers"][timer_name] = {
+                "count": timer.count,
+                "avg_ms": timer.total / timer.count,
+                "min_ms": timer.min,
+                "max_ms": timer.max,
+                "p50_ms": timer.p50.value(),
+                "p95_ms": timer.p95.value() if timer.count > 20 else timer.max,
+            }
         
         return stats
     
+    def _timer_metric_stats(self, metric_name: str) -> Dict[str, Any]:
+        """Stats for a "<timer>.duration_ms" name, served from the timer itself."""
+        timer = self.timer_stats.get(metric_name.removesuffix(".duration_ms"))
+        if not metric_name.endswith(".duration_ms") or timer is None:
+            return {}
+        return timer.summary()
+    
+    def count_since(self, cutoff: datetime) -> int:
+        """Number of retained metric and timer samples recorded at or after `cutoff`."""
+        # Each history is in append (time) order, so bisect for the cutoff
+        metric_count = sum(
+            len(metrics) - bisect_left(metrics, cutoff, key=attrgetter("timestamp"))
+            for metrics in list(self.metrics_by_name.values())
+        )
+        timer_count = sum(
+            len(timestamps) - bisect_left(timestamps, cutoff)
+            for timestamps in list(self.timer_timestamps.values())
+        )
+        return metric_count + timer_count
+    
+    def refresh_snapshot(self):
+        """Publish a fresh read-only copy of the counters."""
+        # Readers get the new dict by reference swap
+        self._snapshot = {"counters": self.counter_values()}
+        self._snapshot_at = time.monotonic()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the latest published snapshot.
+        
+        Callers must treat it as immutable. run_snapshot_refresh() keeps it
+        fresh in the app; without that task (workers, scripts) it is rebuilt
+        here once it is older than SNAPSHOT_MAX_AGE.
+        """
+        if self._snapshot is None or time.monotonic() - self._snapshot_at > SNAPSHOT_MAX_AGE:
+            self.refresh_snapshot()
+        return self._snapshot
+    
+    async def run_snapshot_refresh(self, interval: float = SNAPSHOT_MAX_AGE):
+        """Refresh the snapshot every `interval` seconds (run as a background task)."""
+        while True:
+            self.refresh_snapshot()
+            await asyncio.sleep(interval)
+    
     def reset(self):
         """Reset all metrics (for testing)."""
-        self.metrics.clear()
+        self.metrics_by_name.clear()
+        self.metric_stats.clear()
         self.counters.clear()
-        self.timers.clear()
+        self.timer_timestamps.clear()
+        self.timer_stats.clear()
+        self.refresh_snapshot()
 
 
 # Global tracker instance
@@ -267,35 +463,34 @@ def get_analytics_summary(hours: int = 24) -> Dict[str, Any]:
     """Get analytics summary for the last N hours."""
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     
-    # Filter recent metrics
-    recent_metrics = [m for m in tracker.metrics if m.timestamp >= cutoff]
-    
     # Calculate stats
     summary = {
         "period_hours": hours,
-        "metrics_count": len(recent_metrics),
+        "metrics_count": tracker.count_since(cutoff),
         "stats": tracker.get_stats(),
     }
     
+    counters = summary["stats"]["counters"]
+    
     # Document stats
     summary["documents"] = {
-        "uploaded": tracker.counters.get("documents.uploaded", 0),
-        "processed": tracker.counters.get("extractions.succeeded", 0),
-        "failed": tracker.counters.get("extractions.failed", 0),
+        "uploaded": counters.get("documents.uploaded", 0),
+        "processed": counters.get("extractions.succeeded", 0),
+        "failed": counters.get("extractions.failed", 0),
     }
     
     # QBO stats
     summary["qbo"] = {
-        "synced": tracker.counters.get("qbo.syncs.succeeded", 0),
-        "failed": tracker.counters.get("qbo.syncs.failed", 0),
+        "synced": counters.get("qbo.syncs.succeeded", 0),
+        "failed": counters.get("qbo.syncs.failed", 0),
     }
     
     # API stats
     summary["api"] = {
-        "total_requests": sum(v for k, v in tracker.counters.items() if k.startswith("api.requests.")),
+        "total_requests": sum(v for k, v in counters.items() if k.startswith("api.requests.")),
         "by_method": {
             k.replace("api.requests.", ""): v
-            for k, v in tracker.counters.items()
+            for k, v in counters.items()
             if k.startswith("api.requests.")
         },
     }
@@ -4,11 +4,20 @@ AI-powered document extraction service
 Uses GPT-4o or Claude for multi-modal document understanding.
 """
 
+import asyncio
 import base64
-import json
-from typing import Optional, List, Tuple
+import io
+import os
+import re
+from contextlib import aclosing
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, List, Tuple, Union
 from pathlib import Path
 
+import orjson
+
+from app.core.logging import get_logger
 from app.schemas.documents import (
     DocumentType,
     ReceiptData,
@@ -17,6 +26,113 @@ from app.schemas.documents import (
     CheckData,
     LineItem,
 )
+from app.services.extraction.pdf_utils import CHECK_JPEG_QUALITY, aiter_pdf_pages, sniff_mime_type
+
+try:
+    # SIMD base64, several times faster than the stdlib on multi-MB page images
+    from pybase64 import b64encode_as_string
+except ImportError:
+    def b64encode_as_string(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii")
+
+logger = get_logger("extraction")
+
+# Max vision requests in flight per statement (keeps bursts under provider RPM limits)
+PAGE_CONCURRENCY = 8
+
+# Statement pages sent together in one transaction-extraction request
+PAGES_PER_REQUEST = 4
+
+# Reply budget per page image; multi-page requests get one budget per page,
+# capped at the model's output limit (gpt-4o / claude-3-5-sonnet)
+MAX_TOKENS_PER_PAGE = 4096
+MAX_OUTPUT_TOKENS = {"openai": 16384, "anthropic": 8192}
+
+# Body of the first markdown code block in a model response (closing fence optional)
+_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+# Rendered page batches waiting for a request slot (bounds memory for long PDFs)
+PAGE_QUEUE_SIZE = 4
+
+BANK_STATEMENT_HEADER_PROMPT = """Extract the bank statement header information.
+        
+        Return JSON:
+        {
+            "bank_name": "Bank name",
+            "account_number_last4": "1234",
+            "account_type": "checking/savings",
+            "statement_period_start": "YYYY-MM-DD",
+            "statement_period_end": "YYYY-MM-DD",
+            "beginning_balance": 1000.00,
+            "ending_balance": 1500.00
+        }
+        
+        Return ONLY valid JSON."""
+
+_TRANSACTION_SCHEMA = """{
+            "date": "YYYY-MM-DD",
+            "description": "Full description text",
+            "amount": -123.45,  // Negative for debits/withdrawals, positive for credits/deposits
+            "transaction_type": "check/debit/credit/deposit/transfer/fee/atm",
+            "check_number": "1234",  // Only if this is a check, otherwise null
+            "running_balance": 1500.00,  // If shown, otherwise null
+            "vendor_suggestion": "Likely vendor name"  // Your best guess at the vendor
+        }"""
+
+BANK_STATEMENT_PAGE_PROMPT = f"""Extract ALL transactions from this bank statement page.
+        
+        For each transaction, return:
+        {_TRANSACTION_SCHEMA}
+        
+        Return a JSON array of all transactions on this page.
+        Return ONLY valid JSON array, no explanation.
+        If no transactions on this page, return []."""
+
+BANK_STATEMENT_PAGES_PROMPT = f"""These images are consecutive pages of one bank statement, in order.
+        Extract ALL transactions from every page.
+        
+        For each transaction, return:
+        {_TRANSACTION_SCHEMA}
+        
+        Return a JSON array containing one array of transactions per image,
+        in the same order as the images. Use [] for a page with no transactions.
+        Return ONLY valid JSON, no explanation."""
+
+
+CHECK_PROMPT = """Extract all information from this check image.
+        
+        Return JSON:
+        {
+            "check_number": "1234",
+            "payee": "Who the check is made out to",
+            "amount": 500.00,
+            "date": "YYYY-MM-DD",
+            "memo": "Memo line text",
+            "bank_name": "Bank name if visible",
+            "routing_number": "123456789",  // If visible, otherwise null
+            "account_number_last4": "5678"  // Last 4 digits if visible
+        }
+        
+        Return ONLY valid JSON."""
+
+CHECK_REGIONS_PROMPT = """Look at this bank statement page. 
+        Find any check images that appear on the page.
+        
+        For each check image found, return its approximate location:
+        {
+            "checks": [
+                {
+                    "x_percent": 10,  // Left edge as percentage of page width
+                    "y_percent": 20,  // Top edge as percentage of page height
+                    "width_percent": 40,  // Width as percentage of page width
+                    "height_percent": 20,  // Height as percentage of page height
+                    "check_number": "1234"  // If visible
+                }
+            ]
+        }
+        
+        Return empty array if no check images found.
+        Return ONLY valid JSON."""
 
 
 class DocumentExtractor:
@@ -51,6 +167,18 @@ class DocumentExtractor:
             self.model = "claude-3-5-sonnet-20241022"
         else:
             raise ValueError(f"Unknown provider: {provider}")
+        
+        # Async client for concurrent page requests (used from the app's event loop)
+        self.aclient = self._new_async_client()
+    
+    def _new_async_client(self):
+        """Async SDK client for this provider."""
+        if self.provider == "openai":
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(api_key=self.api_key)
+        
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=self.api_key)
     
     def classify_document(self, image_data: bytes) -> DocumentType:
         """
@@ -126,40 +254,150 @@ class DocumentExtractor:
         """
         Extract all transactions from a bank statement.
         
+        Synchronous wrapper around aextract_bank_statement for worker code.
+        Runs on a fresh event loop with its own short-lived async client,
+        since SDK connection pools can't be shared across loops.
+        
         Args:
             pdf_pages: List of page images (as bytes)
             
         Returns:
             BankStatementData with all transactions
         """
-        # First, extract header info from first page
-        header_prompt = """Extract the bank statement header information.
+        async def run() -> BankStatementData:
+            async with self._new_async_client() as aclient:
+                return await self.aextract_bank_statement(pdf_pages, aclient=aclient)
         
-        Return JSON:
-        {
-            "bank_name": "Bank name",
-            "account_number_last4": "1234",
-            "account_type": "checking/savings",
-            "statement_period_start": "YYYY-MM-DD",
-            "statement_period_end": "YYYY-MM-DD",
-            "beginning_balance": 1000.00,
-            "ending_balance": 1500.00
-        }
+        return asyncio.run(run())
+    
+    async def aextract_bank_statement(
+        self,
+        pdf_pages: List[bytes],
+        aclient=None,
+    ) -> BankStatementData:
+        """
+        Extract all transactions from a bank statement, pages in parallel.
         
-        Return ONLY valid JSON."""
+        Pages go out PAGES_PER_REQUEST to a request, and the header request
+        and every batch are in flight together (up to PAGE_CONCURRENCY), so
+        wall time is roughly one round trip per PAGE_CONCURRENCY batches.
+        
+        Args:
+            pdf_pages: List of page images (as bytes)
+            aclient: Async SDK client to use (defaults to self.aclient)
+            
+        Returns:
+            BankStatementData with all transactions
+        """
+        aclient = aclient or self.aclient
+        limit = asyncio.Semaphore(PAGE_CONCURRENCY)
+        
+        async def header() -> str:
+            async with limit:
+                return await self._avision_request(aclient, pdf_pages[0], BANK_STATEMENT_HEADER_PROMPT)
+        
+        async def transactions(batch: List[bytes]) -> List[List[BankTransaction]]:
+            async with limit:
+                return await self._aextract_transactions_batch(aclient, batch)
+        
+        # Header info comes from the first page, alongside the page requests
+        header_task = asyncio.create_task(header())
+        batch_results = await asyncio.gather(*(
+            transactions(pdf_pages[i:i + PAGES_PER_REQUEST])
+            for i in range(0, len(pdf_pages), PAGES_PER_REQUEST)
+        ))
+        header_data = self._parse_json(await header_task)
+        
+        return self._build_bank_statement(header_data, batch_results)
+    
+    async def aextract_bank_statement_pdf(
+        self,
+        pdf_data: bytes,
+        dpi: int = 200,
+        aclient=None,
+    ) -> BankStatementData:
+        """
+        Extract a bank statement straight from PDF bytes.
         
-        header_response = self._vision_request(pdf_pages[0], header_prompt)
-        header_data = self._parse_json(header_response)
+        Pages are rendered one at a time on the PDF thread and handed, in
+        batches of PAGES_PER_REQUEST, to PAGE_CONCURRENCY request workers
+        through a small bounded queue. Rendering overlaps the requests
+        already in flight and only a few rendered pages are in memory.
         
-        # Extract transactions from all pages
-        all_transactions = []
-        for page in pdf_pages:
-            txns = self._extract_transactions_from_page(page)
-            all_transactions.extend(txns)
+        Args:
+            pdf_data: PDF file content
+            dpi: Rendering resolution
+            aclient: Async SDK client to use (defaults to self.aclient)
+            
+        Returns:
+            BankStatementData with all transactions
+        """
+        aclient = aclient or self.aclient
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+        responses = {}
+        
+        async def render_pages():
+            batch = []
+            index = 0
+            async with aclosing(aiter_pdf_pages(pdf_data, dpi=dpi)) as pages:
+                async for image_data, _ in pages:
+                    if index == 0 and not batch:
+                        # First page: start the header request right away
+                        await jobs.put(("header", [image_data]))
+                    batch.append(image_data)
+                    if len(batch) == PAGES_PER_REQUEST:
+                        await jobs.put((index, batch))
+                        batch = []
+                        index += 1
+            
+            if batch:
+                await jobs.put((index, batch))
+            for _ in range(PAGE_CONCURRENCY):
+                await jobs.put(None)
+        
+        async def send_requests():
+            while (job := await jobs.get()) is not None:
+                key, images = job
+                if key == "header":
+                    responses[key] = await self._avision_request(aclient, images[0], BANK_STATEMENT_HEADER_PROMPT)
+                else:
+                    responses[key] = await self._aextract_transactions_batch(aclient, images)
         
-        # Calculate totals
-        total_deposits = sum(t.amount for t in all_transactions if t.amount > 0)
-        total_withdrawals = sum(abs(t.amount) for t in all_transactions if t.amount < 0)
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(render_pages())
+                for _ in range(PAGE_CONCURRENCY):
+                    tasks.create_task(send_requests())
+        except ExceptionGroup as errors:
+            # Surface the first failure (the rest were cancelled alongside it)
+            raise errors.exceptions[0]
+        
+        header_data = self._parse_json(responses.pop("header", "{}"))
+        batch_results = [responses[index] for index in sorted(responses)]
+        
+        return self._build_bank_statement(header_data, batch_results)
+    
+    def _build_bank_statement(
+        self,
+        header_data: dict,
+        batch_results: List[List[List[BankTransaction]]],
+    ) -> BankStatementData:
+        """Assemble statement data from the header and per-batch page transactions."""
+        # Transactions in page order
+        all_transactions = [
+            txn
+            for pages in batch_results
+            for page_transactions in pages
+            for txn in page_transactions
+        ]
+        
+        # Calculate totals in one pass (Decimal throughout, no float rounding)
+        total_deposits = total_withdrawals = Decimal(0)
+        for txn in all_transactions:
+            if txn.amount > 0:
+                total_deposits += txn.amount
+            elif txn.amount < 0:
+                total_withdrawals -= txn.amount
         
         return BankStatementData(
             bank_name=header_data.get("bank_name"),
@@ -178,30 +416,79 @@ class DocumentExtractor:
     
     def _extract_transactions_from_page(self, page_image: bytes) -> List[BankTransaction]:
         """Extract transactions from a single page of bank statement."""
+        response = self._vision_response(page_image, BANK_STATEMENT_PAGE_PROMPT)
+        return self._page_transactions(response)
+    
+    async def _aextract_transactions_from_page(self, aclient, page_image: bytes) -> List[BankTransaction]:
+        """Async _extract_transactions_from_page."""
+        response = await self._avision_response(aclient, page_image, BANK_STATEMENT_PAGE_PROMPT)
+        return self._page_transactions(response)
+    
+    def _extract_transactions_batch(self, pages: List[bytes]) -> List[List[BankTransaction]]:
+        """
+        Extract transactions from several pages in one request (one list per page).
         
-        prompt = """Extract ALL transactions from this bank statement page.
-        
-        For each transaction, return:
-        {
-            "date": "YYYY-MM-DD",
-            "description": "Full description text",
-            "amount": -123.45,  // Negative for debits/withdrawals, positive for credits/deposits
-            "transaction_type": "check/debit/credit/deposit/transfer/fee/atm",
-            "check_number": "1234",  // Only if this is a check, otherwise null
-            "running_balance": 1500.00,  // If shown, otherwise null
-            "vendor_suggestion": "Likely vendor name"  // Your best guess at the vendor
-        }
+        A reply cut off at max_tokens is unparseable JSON and would silently
+        drop every page in the batch, so those pages are re-sent one per request.
+        """
+        if len(pages) == 1:
+            return [self._extract_transactions_from_page(pages[0])]
         
-        Return a JSON array of all transactions on this page.
-        Return ONLY valid JSON array, no explanation.
-        If no transactions on this page, return []."""
+        response = self._vision_response(pages, BANK_STATEMENT_PAGES_PROMPT)
+        if self._is_truncated(response):
+            logger.warning(f"Transactions reply for {len(pages)} pages was truncated; retrying per page")
+            return [self._extract_transactions_from_page(page) for page in pages]
         
-        response = self._vision_request(page_image, prompt)
+        return self._parse_transactions_batch(self._response_text(response), len(pages))
+    
+    async def _aextract_transactions_batch(self, aclient, pages: List[bytes]) -> List[List[BankTransaction]]:
+        """Async _extract_transactions_batch."""
+        if len(pages) == 1:
+            return [await self._aextract_transactions_from_page(aclient, pages[0])]
+        
+        response = await self._avision_response(aclient, pages, BANK_STATEMENT_PAGES_PROMPT)
+        if self._is_truncated(response):
+            logger.warning(f"Transactions reply for {len(pages)} pages was truncated; retrying per page")
+            return list(await asyncio.gather(*(
+                self._aextract_transactions_from_page(aclient, page) for page in pages
+            )))
+        
+        return self._parse_transactions_batch(self._response_text(response), len(pages))
+    
+    def _page_transactions(self, response) -> List[BankTransaction]:
+        """Transactions from a single-page response (nothing left to split if truncated)."""
+        if self._is_truncated(response):
+            logger.warning("Transactions reply for a single page was truncated")
+        return self._parse_transactions(self._response_text(response))
+    
+    def _parse_transactions_batch(self, response: str, page_count: int) -> List[List[BankTransaction]]:
+        """Split a multi-page response (array of per-page arrays) into per-page transactions."""
+        pages_data = self._parse_json(response)
+        
+        if not isinstance(pages_data, list):
+            return [[] for _ in range(page_count)]
+        
+        if pages_data and all(isinstance(page, dict) for page in pages_data):
+            # Model returned one flat array; keep the transactions, credit the first page
+            return [self._build_transactions(pages_data)] + [[] for _ in range(page_count - 1)]
+        
+        pages = [
+            self._build_transactions(page) if isinstance(page, list) else []
+            for page in pages_data[:page_count]
+        ]
+        return pages + [[] for _ in range(page_count - len(pages))]
+    
+    def _parse_transactions(self, response: str) -> List[BankTransaction]:
+        """Build transactions from a page's JSON array response."""
         transactions_data = self._parse_json(response)
         
         if not isinstance(transactions_data, list):
             return []
         
+        return self._build_transactions(transactions_data)
+    
+    def _build_transactions(self, transactions_data: list) -> List[BankTransaction]:
+        """BankTransaction objects from parsed transaction dicts."""
         transactions = []
         for txn in transactions_data:
             transactions.append(BankTransaction(
@@ -218,26 +505,11 @@ class DocumentExtractor:
     
     def extract_check(self, image_data: bytes) -> CheckData:
         """Extract data from a check image."""
-        
-        prompt = """Extract all information from this check image.
-        
-        Return JSON:
-        {
-            "check_number": "1234",
-            "payee": "Who the check is made out to",
-            "amount": 500.00,
-            "date": "YYYY-MM-DD",
-            "memo": "Memo line text",
-            "bank_name": "Bank name if visible",
-            "routing_number": "123456789",  // If visible, otherwise null
-            "account_number_last4": "5678"  // Last 4 digits if visible
-        }
-        
-        Return ONLY valid JSON."""
-        
-        response = self._vision_request(image_data, prompt)
-        data = self._parse_json(response)
-        
+        response = self._vision_request(image_data, CHECK_PROMPT)
+        return self._build_check(self._parse_json(response))
+    
+    def _build_check(self, data: dict) -> CheckData:
+        """CheckData from a parsed check response."""
         return CheckData(
             check_number=data.get("check_number"),
             payee=data.get("payee"),
@@ -256,29 +528,8 @@ class DocumentExtractor:
         
         Returns list of bounding boxes where checks are located.
         """
-        prompt = """Look at this bank statement page. 
-        Find any check images that appear on the page.
-        
-        For each check image found, return its approximate location:
-        {
-            "checks": [
-                {
-                    "x_percent": 10,  // Left edge as percentage of page width
-                    "y_percent": 20,  // Top edge as percentage of page height
-                    "width_percent": 40,  // Width as percentage of page width
-                    "height_percent": 20,  // Height as percentage of page height
-                    "check_number": "1234"  // If visible
-                }
-            ]
-        }
-        
-        Return empty array if no check images found.
-        Return ONLY valid JSON."""
-        
-        response = self._vision_request(page_image, prompt)
-        data = self._parse_json(response)
-        
-        return data.get("checks", [])
+        response = self._vision_request(page_image, CHECK_REGIONS_PROMPT)
+        return self._parse_json(response).get("checks", [])
     
     def snip_checks_from_statement(
         self, 
@@ -288,6 +539,9 @@ class DocumentExtractor:
         """
         Find and extract check images from bank statement pages.
         
+        Synchronous wrapper around asnip_checks_from_statement (see
+        extract_bank_statement for why it gets its own async client).
+        
         Args:
             pdf_pages: List of page images
             page_dimensions: List of (width, height) for each page
@@ -295,99 +549,208 @@ class DocumentExtractor:
         Returns:
             List of CheckData with extracted check info and image paths
         """
-        from PIL import Image
-        import io
+        async def run() -> List[CheckData]:
+            async with self._new_async_client() as aclient:
+                return await self.asnip_checks_from_statement(pdf_pages, page_dimensions, aclient=aclient)
         
-        extracted_checks = []
+        return asyncio.run(run())
+    
+    async def asnip_checks_from_statement(
+        self,
+        pdf_pages: List[bytes],
+        page_dimensions: List[Tuple[int, int]],
+        aclient=None,
+    ) -> List[CheckData]:
+        """
+        Find and extract check images from bank statement pages, concurrently.
         
-        for i, (page_image, dimensions) in enumerate(zip(pdf_pages, page_dimensions)):
-            # Find check regions on this page
-            check_regions = self.find_check_regions(page_image)
+        Runs in three phases: region lookup for every page at once, crops
+        in worker threads, then extraction for every check at once. Wall
+        time is about two round trips instead of one per page plus one per
+        check. Requests are capped at PAGE_CONCURRENCY in flight.
+        
+        Args:
+            pdf_pages: List of page images
+            page_dimensions: List of (width, height) for each page
+            aclient: Async SDK client to use (defaults to self.aclient)
             
-            for region in check_regions:
-                # Convert percentage to pixels
-                width, height = dimensions
-                x = int(region["x_percent"] / 100 * width)
-                y = int(region["y_percent"] / 100 * height)
-                w = int(region["width_percent"] / 100 * width)
-                h = int(region["height_percent"] / 100 * height)
-                
-                # Crop the check image
-                img = Image.open(io.BytesIO(page_image))
-                check_img = img.crop((x, y, x + w, y + h))
-                
-                # Convert back to bytes
-                buffer = io.BytesIO()
-                check_img.save(buffer, format="PNG")
-                check_bytes = buffer.getvalue()
-                
-                # Extract check data from the cropped image
-                check_data = self.extract_check(check_bytes)
-                check_data.image_path = None  # Will be set after upload to storage
-                
-                extracted_checks.append(check_data)
+        Returns:
+            List of CheckData in page order
+        """
+        aclient = aclient or self.aclient
+        limit = asyncio.Semaphore(PAGE_CONCURRENCY)
+        
+        async def request(image_data: bytes, prompt: str) -> dict:
+            async with limit:
+                return self._parse_json(await self._avision_request(aclient, image_data, prompt))
+        
+        # Find check regions on every page
+        region_responses = await asyncio.gather(*(
+            request(page_image, CHECK_REGIONS_PROMPT) for page_image in pdf_pages
+        ))
+        
+        # Crop them (CPU work, off the event loop)
+        crops_per_page = await asyncio.gather(*(
+            asyncio.to_thread(self._crop_checks, page_image, dimensions, regions)
+            for page_image, dimensions, response in zip(pdf_pages, page_dimensions, region_responses)
+            if (regions := response.get("checks"))
+        ))
+        
+        # Extract check data from every cropped image
+        check_responses = await asyncio.gather(*(
+            request(check_bytes, CHECK_PROMPT)
+            for crops in crops_per_page
+            for check_bytes in crops
+        ))
+        
+        extracted_checks = []
+        for data in check_responses:
+            check_data = self._build_check(data)
+            check_data.image_path = None  # Will be set after upload to storage
+            extracted_checks.append(check_data)
         
         return extracted_checks
     
-    def _vision_request(self, image_data: bytes, prompt: str) -> str:
-        """Make a vision API request."""
+    def _crop_checks(
+        self,
+        page_image: bytes,
+        dimensions: Tuple[int, int],
+        check_regions: List[dict],
+    ) -> List[bytes]:
+        """Crop each check region out of a page image (decoded once)."""
+        from PIL import Image
+        
+        img = Image.open(io.BytesIO(page_image))
+        img.load()
+        
+        crops = []
+        for region in check_regions:
+            # Convert percentage to pixels
+            width, height = dimensions
+            x = int(region["x_percent"] / 100 * width)
+            y = int(region["y_percent"] / 100 * height)
+            w = int(region["width_percent"] / 100 * width)
+            h = int(region["height_percent"] / 100 * height)
+            
+            # Crop the check image
+            check_img = img.crop((x, y, x + w, y + h))
+            
+            # Convert back to bytes (JPEG: far smaller to upload, still legible)
+            buffer = io.BytesIO()
+            check_img.convert("RGB").save(buffer, format="JPEG", quality=CHECK_JPEG_QUALITY, optimize=True)
+            crops.append(buffer.getvalue())
         
-        image_b64 = base64.b64encode(image_data).decode("utf-8")
+        return crops
+    
+    def _vision_request(self, image_data: Union[bytes, List[bytes]], prompt: str) -> str:
+        """Make a vision API request (one image, or several in order)."""
+        return self._response_text(self._vision_response(image_data, prompt))
+    
+    async def _avision_request(self, aclient, image_data: Union[bytes, List[bytes]], prompt: str) -> str:
+        """Make a vision API request on an async client."""
+        return self._response_text(await self._avision_response(aclient, image_data, prompt))
+    
+    def _vision_response(self, image_data: Union[bytes, List[bytes]], prompt: str):
+        """Raw SDK response for a vision request."""
+        if self.provider == "openai":
+            return self.client.chat.completions.create(**self._vision_payload(image_data, prompt))
+        return self.client.messages.create(**self._vision_payload(image_data, prompt))
+    
+    async def _avision_response(self, aclient, image_data: Union[bytes, List[bytes]], prompt: str):
+        """Raw SDK response for a vision request on an async client."""
+        if self.provider == "openai":
+            return await aclient.chat.completions.create(**self._vision_payload(image_data, prompt))
+        return await aclient.messages.create(**self._vision_payload(image_data, prompt))
+    
+    def _vision_payload(self, image_data: Union[bytes, List[bytes]], prompt: str) -> dict:
+        """Request arguments for a vision prompt over one or more images."""
+        images = [image_data] if isinstance(image_data, bytes) else image_data
+        max_tokens = min(MAX_TOKENS_PER_PAGE * len(images), MAX_OUTPUT_TOKENS[self.provider])
+        encoded = [
+            (sniff_mime_type(image) or "image/png", b64encode_as_string(image))
+            for image in images
+        ]
         
         if self.provider == "openai":
-            response = self.client.chat.completions.create(
+            return dict(
                 model=self.model,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_b64}"
+                            *(
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:{media_type};base64,{image_b64}"
+                                    }
                                 }
-                            }
+                                for media_type, image_b64 in encoded
+                            ),
                         ]
                     }
                 ],
-                max_tokens=4096,
+                max_tokens=max_tokens,
             )
-            return response.choices[0].message.content
-            
-        elif self.provider == "anthropic":
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
+        
+        return dict(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        *(
                             {
                                 "type": "image",
                                 "source": {
                                     "type": "base64",
-                                    "media_type": "image/png",
+                                    "media_type": media_type,
                                     "data": image_b64,
                                 }
-                            },
-                            {"type": "text", "text": prompt}
-                        ]
-                    }
-                ]
-            )
-            return response.content[0].text
+                            }
+                            for media_type, image_b64 in encoded
+                        ),
+                        {"type": "text", "text": prompt}
+                    ]
+                }
+            ]
+        )
+    
+    def _is_truncated(self, response) -> bool:
+        """Whether the reply stopped because it hit max_tokens."""
+        if self.provider == "openai":
+            return response.choices[0].finish_reason == "length"
+        return response.stop_reason == "max_tokens"
+    
+    def _response_text(self, response) -> str:
+        """Text of a completion response."""
+        if self.provider == "openai":
+            return response.choices[0].message.content
+        return response.content[0].text
     
     def _parse_json(self, response: str) -> dict:
         """Parse JSON from AI response, handling markdown code blocks."""
         
         # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
+        fenced = _CODE_FENCE_RE.search(response)
+        if fenced:
+            response = fenced.group(1)
         
         try:
-            return json.loads(response.strip())
-        except json.JSONDecodeError:
+            return orjson.loads(response.strip())
+        except orjson.JSONDecodeError:
             return {}
+
+
+@lru_cache(maxsize=2)
+def get_extractor(provider: str) -> DocumentExtractor:
+    """
+    Get a shared extractor for a provider.
+    
+    SDK clients hold their own HTTP connection pools, so one instance per
+    provider is reused across documents instead of rebuilding it each time.
+    """
+    api_key = os.environ[f"{provider.upper()}_API_KEY"]
+    return DocumentExtractor(api_key=api_key, provider=provider)
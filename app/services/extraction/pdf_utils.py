@@ -4,54 +4,131 @@ PDF processing utilities.
 Converts PDFs to images for AI vision model processing.
 """
 
+import asyncio
+import functools
 import io
-from typing import List, Tuple, Optional
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, List, Tuple, Optional, TypeVar
 from pathlib import Path
 
+# JPEG quality for images sent to vision models (checks get more for legibility)
+JPEG_QUALITY = 85
+CHECK_JPEG_QUALITY = 92
 
-def pdf_to_images(
+T = TypeVar("T")
+
+# PyMuPDF doesn't support multithreaded use, so every PDF operation in the
+# process runs on this one thread (documents render one after another)
+_PDF_THREAD_NAME = "pymupdf"
+_pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=_PDF_THREAD_NAME)
+
+
+def run_on_pdf_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run func on the PDF thread and wait for the result."""
+    if threading.current_thread().name.startswith(_PDF_THREAD_NAME):
+        return func(*args, **kwargs)
+    return _pdf_executor.submit(func, *args, **kwargs).result()
+
+
+async def arun_on_pdf_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """Await func on the PDF thread without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pdf_executor, functools.partial(func, *args, **kwargs))
+
+
+def _open_pdf(pdf_data: bytes):
+    """Open PDF bytes as a PyMuPDF document (rendered in-process, no poppler)."""
+    try:
+        import pymupdf
+    except ImportError:
+        raise ImportError(
+            "PyMuPDF required. Install with: "
+            "pip install pymupdf"
+        )
+    
+    return pymupdf.open(stream=pdf_data, filetype="pdf")
+
+
+def _render_pdf_pages(
+    pdf_data: bytes,
+    dpi: int,
+    max_pages: Optional[int],
+) -> Iterator[Tuple[bytes, Tuple[int, int]]]:
+    """Page renderer; must only be advanced and closed on the PDF thread."""
+    with _open_pdf(pdf_data) as doc:
+        last_page = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+        
+        for page in doc.pages(0, last_page):
+            pix = page.get_pixmap(dpi=dpi)
+            yield pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY), (pix.width, pix.height)
+
+
+def iter_pdf_pages(
     pdf_data: bytes,
     dpi: int = 200,
     max_pages: Optional[int] = None,
-) -> List[Tuple[bytes, Tuple[int, int]]]:
+) -> Iterator[Tuple[bytes, Tuple[int, int]]]:
     """
-    Convert PDF to list of images (one per page).
+    Render PDF pages one at a time.
+    
+    Each page is rasterized (on the PDF thread) only when the next item is
+    requested, so a consumer can work on page k while page k+1 renders and
+    at most one rendered page is held here.
     
     Args:
         pdf_data: PDF file content as bytes
         dpi: Resolution for rendering (default 200)
         max_pages: Maximum pages to process (None for all)
         
-    Returns:
-        List of (image_bytes, (width, height)) tuples
+    Yields:
+        (JPEG bytes, (width, height)) per page
     """
+    pages = _render_pdf_pages(pdf_data, dpi, max_pages)
     try:
-        from pdf2image import convert_from_bytes
-        from PIL import Image
-    except ImportError:
-        raise ImportError(
-            "pdf2image and Pillow required. Install with: "
-            "pip install pdf2image Pillow"
-        )
+        while (page := run_on_pdf_thread(next, pages, None)) is not None:
+            yield page
+    finally:
+        run_on_pdf_thread(pages.close)
+
+
+async def aiter_pdf_pages(
+    pdf_data: bytes,
+    dpi: int = 200,
+    max_pages: Optional[int] = None,
+) -> AsyncIterator[Tuple[bytes, Tuple[int, int]]]:
+    """
+    Async iter_pdf_pages: the event loop awaits each page from the PDF thread.
     
-    # Convert PDF to PIL images
-    pil_images = convert_from_bytes(
-        pdf_data,
-        dpi=dpi,
-        first_page=1,
-        last_page=max_pages,
-    )
+    Use with contextlib.aclosing so the document is closed (on the PDF
+    thread) even if the consumer stops early or is cancelled.
+    """
+    pages = _render_pdf_pages(pdf_data, dpi, max_pages)
+    try:
+        while (page := await arun_on_pdf_thread(next, pages, None)) is not None:
+            yield page
+    finally:
+        await arun_on_pdf_thread(pages.close)
+
+
+def pdf_to_images(
+    pdf_data: bytes,
+    dpi: int = 200,
+    max_pages: Optional[int] = None,
+) -> List[Tuple[bytes, Tuple[int, int]]]:
+    """
+    Convert PDF to list of images (one per page).
     
-    results = []
-    for img in pil_images:
-        # Convert to bytes
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        image_bytes = buffer.getvalue()
+    Args:
+        pdf_data: PDF file content as bytes
+        dpi: Resolution for rendering (default 200)
+        max_pages: Maximum pages to process (None for all)
         
-        results.append((image_bytes, img.size))
-    
-    return results
+    Returns:
+        List of (JPEG bytes, (width, height)) tuples
+    """
+    return run_on_pdf_thread(lambda: list(_render_pdf_pages(pdf_data, dpi, max_pages)))
 
 
 def extract_page_as_image(
@@ -68,38 +145,28 @@ def extract_page_as_image(
         dpi: Resolution
         
     Returns:
-        (image_bytes, (width, height))
+        (JPEG bytes, (width, height))
     """
-    from pdf2image import convert_from_bytes
-    
-    images = convert_from_bytes(
-        pdf_data,
-        dpi=dpi,
-        first_page=page_number,
-        last_page=page_number,
-    )
-    
-    if not images:
-        raise ValueError(f"Page {page_number} not found in PDF")
-    
-    img = images[0]
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    
-    return buffer.getvalue(), img.size
+    return run_on_pdf_thread(_extract_page_as_image, pdf_data, page_number, dpi)
+
+
+def _extract_page_as_image(pdf_data: bytes, page_number: int, dpi: int) -> Tuple[bytes, Tuple[int, int]]:
+    with _open_pdf(pdf_data) as doc:
+        if not 1 <= page_number <= doc.page_count:
+            raise ValueError(f"Page {page_number} not found in PDF")
+        
+        pix = doc[page_number - 1].get_pixmap(dpi=dpi)
+        return pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY), (pix.width, pix.height)
 
 
 def get_pdf_page_count(pdf_data: bytes) -> int:
     """Get number of pages in a PDF."""
-    try:
-        from pdf2image import pdfinfo_from_bytes
-        info = pdfinfo_from_bytes(pdf_data)
-        return info.get("Pages", 0)
-    except Exception:
-        # Fallback: try to convert and count
-        from pdf2image import convert_from_bytes
-        images = convert_from_bytes(pdf_data, dpi=72)  # Low DPI for speed
-        return len(images)
+    return run_on_pdf_thread(_get_pdf_page_count, pdf_data)
+
+
+def _get_pdf_page_count(pdf_data: bytes) -> int:
+    with _open_pdf(pdf_data) as doc:
+        return doc.page_count
 
 
 def crop_region_from_pdf_page(
@@ -114,7 +181,8 @@ def crop_region_from_pdf_page(
     """
     Crop a region from a PDF page.
     
-    Used for extracting check images from bank statements.
+    Used for extracting check images from bank statements. Only the
+    requested region is rasterized, not the whole page.
     
     Args:
         pdf_data: PDF content
@@ -126,58 +194,90 @@ def crop_region_from_pdf_page(
         dpi: Resolution for extraction (higher = better quality)
         
     Returns:
-        Cropped image as PNG bytes
+        Cropped image as JPEG bytes
     """
-    from PIL import Image
-    from pdf2image import convert_from_bytes
-    
-    # Get the page as image
-    images = convert_from_bytes(
-        pdf_data,
-        dpi=dpi,
-        first_page=page_number,
-        last_page=page_number,
+    return run_on_pdf_thread(
+        _crop_region_from_pdf_page,
+        pdf_data, page_number, x_percent, y_percent, width_percent, height_percent, dpi,
     )
+
+
+def _crop_region_from_pdf_page(
+    pdf_data: bytes,
+    page_number: int,
+    x_percent: float,
+    y_percent: float,
+    width_percent: float,
+    height_percent: float,
+    dpi: int,
+) -> bytes:
+    import pymupdf
     
-    if not images:
-        raise ValueError(f"Page {page_number} not found")
-    
-    img = images[0]
-    width, height = img.size
-    
-    # Calculate pixel coordinates from percentages
-    x = int(x_percent / 100 * width)
-    y = int(y_percent / 100 * height)
-    w = int(width_percent / 100 * width)
-    h = int(height_percent / 100 * height)
-    
-    # Crop
-    cropped = img.crop((x, y, x + w, y + h))
-    
-    # Convert to bytes
-    buffer = io.BytesIO()
-    cropped.save(buffer, format="PNG")
-    
-    return buffer.getvalue()
+    with _open_pdf(pdf_data) as doc:
+        if not 1 <= page_number <= doc.page_count:
+            raise ValueError(f"Page {page_number} not found")
+        
+        page = doc[page_number - 1]
+        rect = page.rect
+        
+        # Calculate the clip in page coordinates from percentages
+        x = rect.x0 + x_percent / 100 * rect.width
+        y = rect.y0 + y_percent / 100 * rect.height
+        w = width_percent / 100 * rect.width
+        h = height_percent / 100 * rect.height
+        
+        # Rasterize just the clip
+        pix = page.get_pixmap(dpi=dpi, clip=pymupdf.Rect(x, y, x + w, y + h))
+        return pix.tobytes("jpeg", jpg_quality=CHECK_JPEG_QUALITY)
+
+
+# Leading magic bytes -> MIME type, checked in order against one header slice
+_SIGNATURES = (
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+_HEIC_BRANDS = frozenset({b"ftypheic", b"ftypheix", b"ftypmif1"})
+_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/gif"})
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """MIME type from the built-in signatures (no libmagic), or None."""
+    head = data[:12]
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[4:12] in _HEIC_BRANDS:
+        return "image/heic"
+    return None
 
 
 def is_pdf(data: bytes) -> bool:
     """Check if data is a PDF file."""
-    return data[:4] == b'%PDF'
+    return data.startswith(b"%PDF")
 
 
 def is_image(data: bytes) -> bool:
-    """Check if data is a common image format."""
-    # PNG
-    if data[:8] == b'\x89PNG\r\n\x1a\n':
-        return True
-    # JPEG
-    if data[:2] == b'\xff\xd8':
-        return True
-    # GIF
-    if data[:6] in (b'GIF87a', b'GIF89a'):
-        return True
-    return False
+    """Check if data is a common image format (PNG, JPEG, GIF)."""
+    return sniff_mime_type(data) in _IMAGE_TYPES
+
+
+def detect_mime_type(data: bytes) -> Optional[str]:
+    """
+    Detect MIME type from magic bytes.
+    
+    Only the first few KB are needed. Falls back to the built-in PDF/image
+    signatures when libmagic isn't available.
+    """
+    try:
+        import magic
+        return magic.from_buffer(data, mime=True)
+    except ImportError:
+        pass
+    
+    return sniff_mime_type(data)
 
 
 def get_image_dimensions(image_data: bytes) -> Tuple[int, int]:
@@ -191,32 +291,40 @@ def get_image_dimensions(image_data: bytes) -> Tuple[int, int]:
 def normalize_image(
     image_data: bytes,
     max_dimension: int = 2048,
-    format: str = "PNG",
+    format: str = "JPEG",
 ) -> bytes:
     """
     Normalize image for AI processing.
     
     - Resize if too large
-    - Convert to consistent format
+    - Convert to consistent format (JPEG keeps vision uploads small;
+      lossless grayscale sources stay PNG)
     - Ensure RGB mode
     """
     from PIL import Image
     
     img = Image.open(io.BytesIO(image_data))
+    source_format = img.format
     
-    # Convert to RGB if needed (handles RGBA, grayscale, etc.)
-    if img.mode not in ("RGB", "L"):
-        img = img.convert("RGB")
-    
-    # Resize if too large
+    # Resize if too large. JPEGs are first decoded at a reduced scale (no
+    # larger than needed for the target size), so a big photo never
+    # materializes at full resolution; thumbnail() then resizes in place.
     width, height = img.size
     if max(width, height) > max_dimension:
         ratio = max_dimension / max(width, height)
-        new_size = (int(width * ratio), int(height * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
+        img.draft("RGB", (math.ceil(width * ratio), math.ceil(height * ratio)))
+        img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    
+    # Convert to RGB if needed (handles RGBA, grayscale, etc.)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
     
     # Save to bytes
+    if format == "JPEG" and img.mode == "L" and source_format == "PNG":
+        format = "PNG"
+    save_options = {"quality": JPEG_QUALITY, "optimize": True} if format == "JPEG" else {}
+    
     buffer = io.BytesIO()
-    img.save(buffer, format=format)
+    img.save(buffer, format=format, **save_options)
     
     return buffer.getvalue()
@@ -5,12 +5,19 @@ Matches extracted transactions from bank statements to QBO bank feed.
 This is the KEY differentiator - auto-matching docs to transactions.
 """
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import date, timedelta
 from decimal import Decimal
 from dataclasses import dataclass
+from collections import defaultdict
 import difflib
 
+try:
+    # C++ upper bound on the difflib ratio, to skip most M x N comparisons
+    from rapidfuzz import fuzz
+except ImportError:
+    fuzz = None
+
 from app.schemas.documents import (
     BankTransaction,
     BankStatementData,
@@ -34,6 +41,137 @@ class QBOBankTransaction:
     has_attachment: bool = False
 
 
+@dataclass
+class _QBOCandidate:
+    """A QBO transaction with the fields scoring needs, prepared once per match run."""
+    txn: QBOBankTransaction
+    description: str  # lowercased, "" when missing
+    date_ordinal: Optional[int]  # date.toordinal(), None when missing
+
+
+def _amount_cents(amount) -> int:
+    """Amount in whole cents, used to bucket transactions by exact amount."""
+    return round(float(amount) * 100)
+
+
+class _TextSimilarity:
+    """
+    Similarity ratios of candidate strings against one fixed text.
+    
+    A difflib SequenceMatcher is built once with the text as seq2 (set_seq2
+    builds the b2j index, the expensive part) and reused via set_seq1.
+    autojunk is off: bank memos repeat the same characters ("ACH DEBIT",
+    "POS PURCHASE") and the popular-character heuristic skews ratios on them.
+    
+    The ratio is always difflib's, so the match thresholds mean the same
+    with or without RapidFuzz. RapidFuzz's fuzz.ratio (Indel, i.e. longest
+    common subsequence) is only used as a bound: difflib's matching blocks
+    are a common subsequence, so its ratio is never higher.
+    """
+    
+    def __init__(self, text: str):
+        self.text = text.lower()
+        self._matcher = difflib.SequenceMatcher(autojunk=False)
+        self._matcher.set_seq2(self.text)
+    
+    def ratio(self, other: str, floor: float = 0.0) -> float:
+        """
+        Similarity ratio (0-1) of other against the fixed text.
+        
+        Callers only act on ratios above floor, so 0.0 is returned as soon
+        as a cheap upper bound rules that out (RapidFuzz's fuzz.ratio, or
+        real_quick_ratio / quick_ratio without it) before the quadratic
+        difflib ratio.
+        """
+        matcher = self._matcher
+        matcher.set_seq1(other)
+        if fuzz is not None:
+            if fuzz.ratio(other, self.text, score_cutoff=floor * 100) / 100 <= floor:
+                return 0.0
+        elif matcher.real_quick_ratio() <= floor or matcher.quick_ratio() <= floor:
+            return 0.0
+        return matcher.ratio()
+
+
+def _text_similarity(text: Optional[str]) -> Optional[_TextSimilarity]:
+    """_TextSimilarity for text, or None when there is no text to compare."""
+    return _TextSimilarity(text) if text else None
+
+
+def _max_weight_assignment(weights: List[List[float]]) -> List[Optional[int]]:
+    """
+    Maximum-total-weight assignment of rows to columns (Hungarian algorithm).
+    
+    Returns the assigned column for each row, or None for rows left over
+    when there are more rows than columns. Ties go to the earlier column.
+    Pure Python, O(n^2 m): meant for the handful of same-amount
+    transactions in one bucket, not whole statements.
+    """
+    n = len(weights)
+    m = len(weights[0]) if n else 0
+    if n == 0 or m == 0:
+        return [None] * n
+    
+    if n > m:
+        # Solve with columns as rows, then invert
+        assignment: List[Optional[int]] = [None] * n
+        for col, row in enumerate(_max_weight_assignment([list(c) for c in zip(*weights)])):
+            assignment[row] = col
+        return assignment
+    
+    # Shortest augmenting paths with potentials, minimizing cost = -weight
+    # (1-based; column 0 is a virtual start column)
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)  # row assigned to each column, 0 = free
+    way = [0] * (m + 1)
+    
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        min_slack = [inf] * (m + 1)
+        visited = [False] * (m + 1)
+        
+        while True:
+            visited[j0] = True
+            i0 = owner[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not visited[j]:
+                    slack = -weights[i0 - 1][j - 1] - u[i0] - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = j0
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        j1 = j
+            
+            for j in range(m + 1):
+                if visited[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if owner[j]:
+            assignment[owner[j] - 1] = j - 1
+    return assignment
+
+
 class BankFeedMatcher:
     """
     Matches extracted bank statement transactions to QBO bank feed.
@@ -83,21 +221,58 @@ class BankFeedMatcher:
         Returns:
             List of TransactionMatch with match results
         """
-        results = []
+        transactions = statement.transactions
         
-        # Create a copy of QBO transactions we can mark as used
-        available_qbo = list(qbo_transactions)
+        # Amount must match exactly, so only same-amount transactions are
+        # ever candidates: bucket the QBO feed by amount once up front,
+        # lowercasing each description once rather than per comparison.
+        # Feed entries already matched in QBO are never candidates.
+        qbo_by_amount: Dict[int, List[_QBOCandidate]] = defaultdict(list)
+        for qbo_txn in qbo_transactions:
+            if qbo_txn.is_matched:
+                continue
+            qbo_by_amount[_amount_cents(qbo_txn.amount)].append(_QBOCandidate(
+                txn=qbo_txn,
+                description=qbo_txn.description.lower() if qbo_txn.description else "",
+                date_ordinal=qbo_txn.date.toordinal() if qbo_txn.date else None,
+            ))
         
-        for extracted_txn in statement.transactions:
-            match_result = self._find_best_match(extracted_txn, available_qbo)
-            
-            # If matched, remove from available pool
-            if match_result.matched and match_result.qbo_transaction_id:
-                available_qbo = [
-                    t for t in available_qbo 
-                    if t.id != match_result.qbo_transaction_id
-                ]
+        rows_by_amount: Dict[int, List[int]] = defaultdict(list)
+        for row, extracted_txn in enumerate(transactions):
+            rows_by_amount[_amount_cents(extracted_txn.amount)].append(row)
+        
+        # Rows only compete for QBO transactions of the same amount, so each
+        # amount is an independent assignment problem: pick the pairing with
+        # the highest total score instead of letting earlier rows take the
+        # best match first
+        match_results: List[Optional[QBOMatchResult]] = [None] * len(transactions)
+        for cents, rows in rows_by_amount.items():
+            candidates = qbo_by_amount.get(cents, [])
+            scored = [self._score_candidates(transactions[row], candidates) for row in rows]
+            weights = [
+                [score if score >= self.suggest_match_threshold else 0.0 for score, _ in row_scores]
+                for row_scores in scored
+            ]
             
+            for row, row_scores, col in zip(rows, scored, _max_weight_assignment(weights)):
+                if col is None or row_scores[col][0] < self.suggest_match_threshold:
+                    match_results[row] = QBOMatchResult(
+                        matched=False,
+                        match_score=0.0,
+                        match_reasons=["No matching transaction found"],
+                    )
+                    continue
+                
+                score, reasons = row_scores[col]
+                match_results[row] = QBOMatchResult(
+                    matched=True,
+                    qbo_transaction_id=candidates[col].txn.id,
+                    match_score=score,
+                    match_reasons=reasons,
+                )
+        
+        results = []
+        for extracted_txn, match_result in zip(transactions, match_results):
             # Link check image if this is a check transaction
             check_image = self._find_check_image(
                 extracted_txn, 
@@ -113,65 +288,76 @@ class BankFeedMatcher:
         
         return results
     
-    def _find_best_match(
+    def _score_candidates(
         self,
         extracted: BankTransaction,
-        qbo_transactions: List[QBOBankTransaction],
-    ) -> QBOMatchResult:
-        """Find the best matching QBO transaction."""
-        
-        candidates = []
-        
-        for qbo_txn in qbo_transactions:
-            score, reasons = self._calculate_match_score(extracted, qbo_txn)
+        qbo_candidates: List[_QBOCandidate],
+    ) -> List[Tuple[float, List[str]]]:
+        """Score an extracted transaction against each same-amount candidate."""
+        
+        # Index the extracted strings once for all candidates
+        description_similarity = _text_similarity(extracted.description)
+        vendor_similarity = _text_similarity(extracted.vendor_suggestion)
+        extracted_ordinal = extracted.date.toordinal() if extracted.date else None
+        
+        scores = []
+        for candidate in qbo_candidates:
+            # Day difference as plain int subtraction, no timedelta per pair
+            date_diff = None
+            if extracted_ordinal is not None and candidate.date_ordinal is not None:
+                date_diff = abs(extracted_ordinal - candidate.date_ordinal)
             
-            if score >= self.suggest_match_threshold:
-                candidates.append((qbo_txn, score, reasons))
-        
-        if not candidates:
-            return QBOMatchResult(
-                matched=False,
-                match_score=0.0,
-                match_reasons=["No matching transaction found"],
-            )
-        
-        # Sort by score, take best
-        candidates.sort(key=lambda x: x[1], reverse=True)
-        best_match, best_score, reasons = candidates[0]
+            scores.append(self._calculate_match_score(
+                extracted,
+                candidate.txn,
+                description_similarity,
+                vendor_similarity,
+                qbo_description=candidate.description,
+                date_diff=date_diff,
+            ))
         
-        return QBOMatchResult(
-            matched=best_score >= self.suggest_match_threshold,
-            qbo_transaction_id=best_match.id,
-            match_score=best_score,
-            match_reasons=reasons,
-        )
+        return scores
     
     def _calculate_match_score(
         self,
         extracted: BankTransaction,
         qbo: QBOBankTransaction,
+        description_similarity: Optional[_TextSimilarity] = None,
+        vendor_similarity: Optional[_TextSimilarity] = None,
+        qbo_description: Optional[str] = None,
+        date_diff: Optional[int] = None,
     ) -> Tuple[float, List[str]]:
         """
         Calculate match score between extracted and QBO transaction.
         
+        The amount match is required; callers only pass QBO transactions
+        from the extracted amount's bucket, so it is not re-checked here.
+        The _TextSimilarity objects hold the extracted description / vendor
+        suggestion and are built here if not passed in; qbo_description is
+        the already-lowercased QBO description and date_diff the absolute
+        day difference, both derived here when omitted.
+        
         Returns (score, list of reasons)
         """
         score = 0.0
         reasons = []
         
-        # Amount match (REQUIRED - must be exact)
-        amount_diff = abs(float(extracted.amount) - float(qbo.amount))
-        if amount_diff < 0.01:
-            score += 40
-            reasons.append(f"Amount matches: ${extracted.amount}")
-        else:
-            # No amount match = no match at all
-            return 0.0, ["Amount does not match"]
+        if description_similarity is None:
+            description_similarity = _text_similarity(extracted.description)
+        if vendor_similarity is None:
+            vendor_similarity = _text_similarity(extracted.vendor_suggestion)
+        if qbo_description is None:
+            qbo_description = qbo.description.lower() if qbo.description else ""
+        
+        # Amount match (REQUIRED - guaranteed by the amount bucket)
+        score += 40
+        reasons.append(f"Amount matches: ${extracted.amount}")
         
         # Date match
-        if extracted.date and qbo.date:
-            date_diff = abs((extracted.date - qbo.date).days)
-            
+        if date_diff is None and extracted.date and qbo.date:
+            date_diff = abs(extracted.date.toordinal() - qbo.date.toordinal())
+        
+        if date_diff is not None:
             if date_diff == 0:
                 score += 30
                 reasons.append("Date matches exactly")
@@ -198,11 +384,8 @@ class BankFeedMatcher:
                 reasons.append(f"Check numbers differ: {extracted.check_number} vs {qbo.check_number}")
         
         # Description/vendor similarity
-        if extracted.description and qbo.description:
-            similarity = self._string_similarity(
-                extracted.description.lower(),
-                qbo.description.lower()
-            )
+        if description_similarity and qbo_description:
+            similarity = description_similarity.ratio(qbo_description, floor=0.3)
             
             if similarity > 0.8:
                 score += 15
@@ -215,13 +398,10 @@ class BankFeedMatcher:
                 reasons.append(f"Description loosely similar ({similarity:.0%})")
         
         # Vendor suggestion match
-        if extracted.vendor_suggestion and qbo.description:
-            vendor_similarity = self._string_similarity(
-                extracted.vendor_suggestion.lower(),
-                qbo.description.lower()
-            )
+        if vendor_similarity and qbo_description:
+            vendor_ratio = vendor_similarity.ratio(qbo_description, floor=0.6)
             
-            if vendor_similarity > 0.6:
+            if vendor_ratio > 0.6:
                 score += 10
                 reasons.append(f"Vendor name matches description")
         
@@ -234,7 +414,7 @@ class BankFeedMatcher:
     
     def _string_similarity(self, s1: str, s2: str) -> float:
         """Calculate string similarity ratio."""
-        return difflib.SequenceMatcher(None, s1, s2).ratio()
+        return difflib.SequenceMatcher(None, s1, s2, autojunk=False).ratio()
     
     def _find_check_image(
         self,
@@ -319,6 +499,9 @@ class VendorMatcher:
         best_match = None
         best_score = 0.0
         
+        # Index the extracted name once, compare each vendor against it
+        name_similarity = _TextSimilarity(extracted_lower)
+        
         for vendor in qbo_vendors:
             vendor_name = vendor.get("name", "").lower()
             
@@ -327,9 +510,7 @@ class VendorMatcher:
                 return vendor, 1.0
             
             # Fuzzy match
-            similarity = difflib.SequenceMatcher(
-                None, extracted_lower, vendor_name
-            ).ratio()
+            similarity = name_similarity.ratio(vendor_name, floor=best_score)
             
             if similarity > best_score:
                 best_score = similarity
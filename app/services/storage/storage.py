@@ -4,8 +4,13 @@ Document storage service.
 Supports local filesystem, S3, and Cloudflare R2.
 """
 
+import hashlib
+import io
 import os
-import uuid
+import secrets
+import shutil
+import mimetypes
+import tempfile
 from pathlib import Path
 from typing import Optional, BinaryIO
 from datetime import datetime
@@ -15,6 +20,11 @@ import boto3
 from botocore.exceptions import ClientError
 
 
+def _gen_id() -> str:
+    """Short random ID for storage keys (8 hex chars)."""
+    return secrets.token_hex(4)
+
+
 class StorageBackend(ABC):
     """Abstract base class for storage backends."""
     
@@ -23,6 +33,11 @@ class StorageBackend(ABC):
         """Upload file and return URL/path."""
         pass
     
+    def upload_path(self, path: Path, key: str, content_type: str) -> str:
+        """Upload a file already on disk. Backends override to avoid re-reading it."""
+        with open(path, "rb") as f:
+            return self.upload(f, key, content_type)
+    
     @abstractmethod
     def download(self, key: str) -> bytes:
         """Download file content."""
@@ -39,6 +54,47 @@ class StorageBackend(ABC):
         pass
 
 
+def _copy_to_file(src: BinaryIO, dst) -> None:
+    """
+    Copy a file-like object into an open local file.
+    
+    Large sources backed by a real file (temp files, and spooled uploads,
+    which are on disk by the time they pass SENDFILE_MIN_SIZE) are copied
+    in the kernel with sendfile, one syscall per large block and no round
+    trip through Python buffers. Anything else, including small spools
+    still held in memory, or platforms where sendfile can't target a
+    regular file, falls back to large chunked writes.
+    """
+    start = src.tell() if src.seekable() else None
+    if start is not None and src.seek(0, os.SEEK_END) - start >= SENDFILE_MIN_SIZE:
+        src.seek(start)
+        try:
+            # Only asked for large sources: SpooledTemporaryFile.fileno()
+            # would move an in-memory spool to disk first
+            in_fd, out_fd = src.fileno(), dst.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            in_fd = None
+        
+        if in_fd is not None:
+            try:
+                offset, size = start, os.fstat(in_fd).st_size
+                while offset < size:
+                    sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                src.seek(offset)
+                return
+            except (AttributeError, OSError):
+                # Undo any partial copy before falling back
+                dst.seek(0)
+                dst.truncate()
+    
+    if start is not None:
+        src.seek(start)
+    shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
 class LocalStorage(StorageBackend):
     """Local filesystem storage for development."""
     
@@ -51,7 +107,16 @@ class LocalStorage(StorageBackend):
         file_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(file_path, "wb") as f:
-            f.write(file.read())
+            _copy_to_file(file, f)
+        
+        return str(file_path)
+    
+    def upload_path(self, path: Path, key: str, content_type: str) -> str:
+        file_path = self.base_path / key
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Same filesystem: rename. Otherwise shutil copies in chunks.
+        shutil.move(str(path), file_path)
         
         return str(file_path)
     
@@ -103,6 +168,16 @@ class S3Storage(StorageBackend):
         )
         return f"s3://{self.bucket}/{key}"
     
+    def upload_path(self, path: Path, key: str, content_type: str) -> str:
+        # upload_file streams from disk (multipart for large files)
+        self.client.upload_file(
+            str(path),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type}
+        )
+        return f"s3://{self.bucket}/{key}"
+    
     def download(self, key: str) -> bytes:
         response = self.client.get_object(Bucket=self.bucket, Key=key)
         return response["Body"].read()
@@ -208,7 +283,7 @@ class DocumentStorage:
         """
         # Generate unique key
         timestamp = datetime.utcnow().strftime("%Y/%m/%d")
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = _gen_id()
         extension = Path(filename).suffix
         
         key = f"{company_id}/{document_type}/{timestamp}/{unique_id}{extension}"
@@ -240,10 +315,8 @@ class DocumentStorage:
             check_number: Check number for naming
             company_id: Company identifier
         """
-        import io
-        
         timestamp = datetime.utcnow().strftime("%Y/%m/%d")
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = _gen_id()
         
         key = f"{company_id}/checks/{timestamp}/check_{check_number}_{unique_id}.png"
         
@@ -268,3 +341,116 @@ class DocumentStorage:
     def delete_document(self, key: str) -> bool:
         """Delete a document."""
         return self.backend.delete(key)
+
+
+class StorageService(DocumentStorage):
+    """
+    Key-based storage used by the API and background tasks.
+    
+    Stores files under generated keys and returns the key, which is what
+    gets persisted on the document row.
+    """
+    
+    def _generate_key(self, filename: str, company_id: str = "default") -> str:
+        timestamp = datetime.utcnow().strftime("%Y/%m/%d")
+        unique_id = _gen_id()
+        extension = Path(filename or "").suffix
+        
+        return f"{company_id}/document/{timestamp}/{unique_id}{extension}"
+    
+    @staticmethod
+    def _guess_content_type(filename: str) -> str:
+        return mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+    
+    def store_file(
+        self,
+        file_data: bytes,
+        filename: str,
+        company_id: str = "default",
+    ) -> str:
+        """Store in-memory file content. Returns the storage key."""
+        return self.store_stream(io.BytesIO(file_data), filename, company_id)
+    
+    def store_stream(
+        self,
+        file: BinaryIO,
+        filename: str,
+        company_id: str = "default",
+        content_type: Optional[str] = None,
+    ) -> str:
+        """
+        Store a file-like object without reading it fully into memory.
+        
+        Local storage copies in chunks; S3/R2 use upload_fileobj.
+        Returns the storage key.
+        """
+        key = self._generate_key(filename, company_id)
+        self.backend.upload(file, key, content_type or self._guess_content_type(filename))
+        return key
+    
+    def store_path(
+        self,
+        path: Path,
+        filename: str,
+        company_id: str = "default",
+    ) -> str:
+        """
+        Store a file that is already on disk (e.g. a spooled upload).
+        
+        Local storage moves the file into place; S3/R2 stream it from disk.
+        The file content is never read into memory. Returns the storage key.
+        """
+        key = self._generate_key(filename, company_id)
+        self.backend.upload_path(Path(path), key, self._guess_content_type(filename))
+        return key
+    
+    def get_file(self, key: str) -> bytes:
+        """Download file content by storage key."""
+        return self.backend.download(key)
+    
+    def delete_file(self, key: str) -> bool:
+        """Delete a file by storage key."""
+        return self.backend.delete(key)
+
+
+# Chunk size used when spooling uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Smallest copy worth a sendfile; Starlette keeps uploads up to 1 MiB in memory
+SENDFILE_MIN_SIZE = 1 << 20
+
+
+async def spool_upload(upload) -> Path:
+    """
+    Spool an uploaded file to a named temp file, one chunk at a time.
+    
+    Args:
+        upload: FastAPI/Starlette ``UploadFile``
+        
+    Returns:
+        Path to the temp file. The caller owns it and must move or delete it.
+    """
+    suffix = Path(upload.filename or "").suffix
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    
+    try:
+        with tmp:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                tmp.write(chunk)
+    except Exception:
+        os.unlink(tmp.name)
+        raise
+    
+    return Path(tmp.name)
+
+
+def hash_stream(file: BinaryIO) -> str:
+    """
+    SHA-256 hex digest of a seekable file, read in chunks.
+    
+    The file is rewound afterwards so it can be stored.
+    """
+    file.seek(0)
+    digest = hashlib.file_digest(file, "sha256").hexdigest()
+    file.seek(0)
+    return digest
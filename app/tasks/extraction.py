@@ -9,7 +9,7 @@ from app.tasks import celery_app
 from app.core.database import get_db_session
 from app.services.extraction.extractor import DocumentExtractor
 from app.services.storage.storage import StorageService
-from app.models.database import Document, ExtractionResult
+from app.models.database import Document
 
 logger = logging.getLogger(__name__)
 
@@ -50,16 +50,7 @@ def extract_document(self, document_id: int) -> Dict[str, Any]:
                 document_type=doc.document_type,
             )
             
-            # Save extraction result
-            extraction = ExtractionResult(
-                document_id=document_id,
-                raw_text=result.get("raw_text"),
-                structured_data=result.get("structured_data"),
-                confidence=result.get("confidence", 0.0),
-            )
-            db.add(extraction)
-            
-            # Update document
+            # Update document (the structured result lives on the row)
             doc.status = "extracted"
             doc.extracted_data = result.get("structured_data")
             
@@ -0,0 +1,174 @@
+"""Baseline schema: the tables as they were before migrations were introduced
+
+Revision ID: 1767a9b8cab0
+Revises: 
+Create Date: 2026-10-15 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1767a9b8cab0'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _uuid() -> postgresql.UUID:
+    return postgresql.UUID(as_uuid=False)
+
+
+def upgrade() -> None:
+    # Databases created with Base.metadata.create_all() before migrations
+    # existed already have these tables; only create what is missing
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    if "companies" not in existing:
+        op.create_table(
+            "companies",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("name", sa.String(length=255), nullable=False),
+            sa.Column("email", sa.String(length=255)),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.Column("subscription_tier", sa.String(length=50)),
+            sa.Column("subscription_status", sa.String(length=50)),
+            sa.Column("stripe_customer_id", sa.String(length=255)),
+            sa.Column("stripe_subscription_id", sa.String(length=255)),
+        )
+    
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("company_id", _uuid(), sa.ForeignKey("companies.id"), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(length=255)),
+            sa.Column("name", sa.String(length=255)),
+            sa.Column("role", sa.String(length=50)),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("last_login", sa.DateTime()),
+        )
+    
+    if "qbo_connections" not in existing:
+        op.create_table(
+            "qbo_connections",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("company_id", _uuid(), sa.ForeignKey("companies.id"), nullable=False),
+            sa.Column("realm_id", sa.String(length=50), nullable=False, unique=True),
+            sa.Column("qbo_company_name", sa.String(length=255)),
+            sa.Column("access_token", sa.Text()),
+            sa.Column("refresh_token", sa.Text()),
+            sa.Column("token_expires_at", sa.DateTime()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("last_sync", sa.DateTime()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+    
+    if "documents" not in existing:
+        op.create_table(
+            "documents",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("company_id", _uuid(), sa.ForeignKey("companies.id"), nullable=False),
+            sa.Column("filename", sa.String(length=255), nullable=False),
+            sa.Column("content_type", sa.String(length=100)),
+            sa.Column("file_size", sa.Integer()),
+            sa.Column("storage_key", sa.String(length=500)),
+            sa.Column("document_type", sa.String(length=50)),
+            sa.Column("status", sa.String(length=50)),
+            sa.Column("error_message", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("processed_at", sa.DateTime()),
+        )
+    
+    if "extracted_data" not in existing:
+        op.create_table(
+            "extracted_data",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("document_id", _uuid(), sa.ForeignKey("documents.id"), nullable=False, unique=True),
+            sa.Column("vendor_name", sa.String(length=255)),
+            sa.Column("vendor_address", sa.Text()),
+            sa.Column("date", sa.DateTime()),
+            sa.Column("total_amount", sa.Numeric(12, 2)),
+            sa.Column("subtotal", sa.Numeric(12, 2)),
+            sa.Column("tax_amount", sa.Numeric(12, 2)),
+            sa.Column("category_suggestion", sa.String(length=100)),
+            sa.Column("category_id", sa.String(length=50)),
+            sa.Column("vendor_id", sa.String(length=50)),
+            sa.Column("confidence", sa.Float()),
+            sa.Column("raw_text", sa.Text()),
+            sa.Column("extraction_model", sa.String(length=100)),
+            sa.Column("qbo_entity_type", sa.String(length=50)),
+            sa.Column("qbo_entity_id", sa.String(length=50)),
+            sa.Column("pushed_to_qbo_at", sa.DateTime()),
+        )
+    
+    if "line_items" not in existing:
+        op.create_table(
+            "line_items",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("extracted_data_id", _uuid(), sa.ForeignKey("extracted_data.id"), nullable=False),
+            sa.Column("description", sa.String(length=500)),
+            sa.Column("quantity", sa.Float()),
+            sa.Column("unit_price", sa.Numeric(12, 2)),
+            sa.Column("amount", sa.Numeric(12, 2)),
+            sa.Column("category", sa.String(length=100)),
+        )
+    
+    if "extracted_transactions" not in existing:
+        op.create_table(
+            "extracted_transactions",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("document_id", _uuid(), sa.ForeignKey("documents.id"), nullable=False),
+            sa.Column("date", sa.DateTime(), nullable=False),
+            sa.Column("description", sa.String(length=500)),
+            sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+            sa.Column("transaction_type", sa.String(length=50)),
+            sa.Column("check_number", sa.String(length=50)),
+            sa.Column("running_balance", sa.Numeric(12, 2)),
+            sa.Column("vendor_suggestion", sa.String(length=255)),
+            sa.Column("vendor_id", sa.String(length=50)),
+            sa.Column("category_suggestion", sa.String(length=100)),
+            sa.Column("category_id", sa.String(length=50)),
+            sa.Column("check_image_key", sa.String(length=500)),
+            sa.Column("qbo_transaction_id", sa.String(length=50)),
+            sa.Column("match_score", sa.Float()),
+            sa.Column("match_status", sa.String(length=50)),
+        )
+    
+    if "audit_logs" not in existing:
+        op.create_table(
+            "audit_logs",
+            sa.Column("id", _uuid(), primary_key=True),
+            sa.Column("company_id", _uuid(), sa.ForeignKey("companies.id")),
+            sa.Column("user_id", _uuid(), sa.ForeignKey("users.id")),
+            sa.Column("action", sa.String(length=100), nullable=False),
+            sa.Column("entity_type", sa.String(length=50)),
+            sa.Column("entity_id", sa.String(length=50)),
+            sa.Column("details", sa.JSON()),
+            sa.Column("ip_address", sa.String(length=50)),
+            sa.Column("user_agent", sa.String(length=500)),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+
+def downgrade() -> None:
+    # Children before parents
+    for table in (
+        "audit_logs",
+        "extracted_transactions",
+        "line_items",
+        "extracted_data",
+        "documents",
+        "qbo_connections",
+        "users",
+        "companies",
+    ):
+        op.drop_table(table)
@@ -0,0 +1,52 @@
+"""Add indexed batch_id column to documents
+
+Revision ID: 3f9c1a2b7d4e
+Revises: 1767a9b8cab0
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a2b7d4e'
+down_revision: Union[str, None] = '1767a9b8cab0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Columns and indexes may already exist on databases built with create_all()
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in inspector.get_columns("documents")}
+    indexes = {i["name"] for i in inspector.get_indexes("documents")}
+    
+    if "batch_id" not in columns:
+        op.add_column(
+            "documents",
+            sa.Column("batch_id", postgresql.UUID(as_uuid=False), nullable=True),
+        )
+        
+        # Backfill from the JSON metadata written by older batch uploads
+        if "metadata" in columns:
+            op.execute(
+                "UPDATE documents SET batch_id = (metadata->>'batch_id')::uuid "
+                "WHERE metadata->>'batch_id' IS NOT NULL"
+            )
+    
+    # Leading batch_id column also serves plain batch_id lookups
+    if "idx_documents_batch_id_status" not in indexes:
+        op.create_index(
+            "idx_documents_batch_id_status",
+            "documents",
+            ["batch_id", "status"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_documents_batch_id_status", table_name="documents")
+    op.drop_column("documents", "batch_id")
@@ -0,0 +1,28 @@
+"""Add extracted_data JSON column to documents
+
+Revision ID: 8b2e4f61c0a9
+Revises: 3f9c1a2b7d4e
+Create Date: 2026-10-15 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f61c0a9'
+down_revision: Union[str, None] = '3f9c1a2b7d4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "extracted_data" not in columns:
+        op.add_column("documents", sa.Column("extracted_data", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "extracted_data")
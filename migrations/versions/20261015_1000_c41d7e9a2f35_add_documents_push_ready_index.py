@@ -0,0 +1,46 @@
+"""Add qbo_sync_status and partial push-ready index to documents
+
+Revision ID: c41d7e9a2f35
+Revises: 8b2e4f61c0a9
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e9a2f35'
+down_revision: Union[str, None] = '8b2e4f61c0a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in inspector.get_columns("documents")}
+    indexes = {i["name"] for i in inspector.get_indexes("documents")}
+    
+    if "qbo_sync_status" not in columns:
+        op.add_column(
+            "documents",
+            sa.Column("qbo_sync_status", sa.String(length=50), nullable=True),
+        )
+    
+    # Only unsynced rows are indexed, so the index stays small as history grows
+    if "idx_documents_push_ready" not in indexes:
+        op.create_index(
+            "idx_documents_push_ready",
+            "documents",
+            ["batch_id", "status"],
+            postgresql_where=sa.text("qbo_sync_status IS NULL"),
+            sqlite_where=sa.text("qbo_sync_status IS NULL"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_documents_push_ready", table_name="documents")
+    # qbo_sync_status is left in place: upgrade() only adds it when missing,
+    # so it may predate this revision and hold data
@@ -0,0 +1,28 @@
+"""Add cached response_json column to documents
+
+Revision ID: 5a7b3c9d1e62
+Revises: c41d7e9a2f35
+Create Date: 2026-10-15 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7b3c9d1e62'
+down_revision: Union[str, None] = 'c41d7e9a2f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "response_json" not in columns:
+        op.add_column("documents", sa.Column("response_json", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "response_json")
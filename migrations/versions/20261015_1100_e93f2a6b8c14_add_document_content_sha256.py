@@ -0,0 +1,44 @@
+"""Add content_sha256 column and per-company unique index to documents
+
+Revision ID: e93f2a6b8c14
+Revises: 5a7b3c9d1e62
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e93f2a6b8c14'
+down_revision: Union[str, None] = '5a7b3c9d1e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in inspector.get_columns("documents")}
+    indexes = {i["name"] for i in inspector.get_indexes("documents")}
+    
+    if "content_sha256" not in columns:
+        op.add_column(
+            "documents",
+            sa.Column("content_sha256", sa.String(length=64), nullable=True),
+        )
+    
+    # Existing rows have NULL digests, which never conflict
+    if "idx_documents_company_sha256" not in indexes:
+        op.create_index(
+            "idx_documents_company_sha256",
+            "documents",
+            ["company_id", "content_sha256"],
+            unique=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_documents_company_sha256", table_name="documents")
+    op.drop_column("documents", "content_sha256")
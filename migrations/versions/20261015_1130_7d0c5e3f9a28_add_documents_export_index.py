@@ -0,0 +1,39 @@
+"""Add (company_id, status, created_at DESC) index for exports
+
+Revision ID: 7d0c5e3f9a28
+Revises: e93f2a6b8c14
+Create Date: 2026-10-15 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d0c5e3f9a28'
+down_revision: Union[str, None] = 'e93f2a6b8c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    indexes = {i["name"] for i in sa.inspect(bind).get_indexes("documents")}
+    if "idx_documents_company_status_created" in indexes:
+        return
+    
+    # Build without locking writes on Postgres; CONCURRENTLY can't run in a transaction
+    concurrently = bind.dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_documents_company_status_created",
+            "documents",
+            ["company_id", "status", sa.text("created_at DESC")],
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_documents_company_status_created", table_name="documents")
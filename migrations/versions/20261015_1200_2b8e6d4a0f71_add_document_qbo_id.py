@@ -0,0 +1,30 @@
+"""Add qbo_id column to documents
+
+Revision ID: 2b8e6d4a0f71
+Revises: 7d0c5e3f9a28
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b8e6d4a0f71'
+down_revision: Union[str, None] = '7d0c5e3f9a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("documents")}
+    if "qbo_id" not in columns:
+        op.add_column("documents", sa.Column("qbo_id", sa.String(length=50), nullable=True))
+
+
+def downgrade() -> None:
+    # qbo_id is left in place: upgrade() only adds it when missing, so it may
+    # predate this revision and hold pushed transaction IDs
+    pass
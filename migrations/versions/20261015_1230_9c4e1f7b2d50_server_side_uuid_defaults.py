@@ -0,0 +1,49 @@
+"""Generate UUID primary keys in the database
+
+Revision ID: 9c4e1f7b2d50
+Revises: 2b8e6d4a0f71
+Create Date: 2026-10-15 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1f7b2d50'
+down_revision: Union[str, None] = '2b8e6d4a0f71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = (
+    "companies",
+    "users",
+    "qbo_connections",
+    "documents",
+    "extracted_data",
+    "line_items",
+    "extracted_transactions",
+    "audit_logs",
+)
+
+
+def upgrade() -> None:
+    # SQLite can't alter column defaults; new SQLite databases get them from create_all
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    
+    # gen_random_uuid() is built in from Postgres 13; pgcrypto provides it before that
+    op.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto")
+    for table in TABLES:
+        op.alter_column(table, "id", server_default=sa.text("gen_random_uuid()"))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    
+    for table in TABLES:
+        op.alter_column(table, "id", server_default=None)
@@ -0,0 +1,46 @@
+"""Add created_at, transaction date and QBO push indexes
+
+Revision ID: 4f8a2c6e1b93
+Revises: 9c4e1f7b2d50
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8a2c6e1b93'
+down_revision: Union[str, None] = '9c4e1f7b2d50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ("idx_documents_created_at", "documents", ["created_at"]),
+    ("idx_extracted_transactions_document_date", "extracted_transactions", ["document_id", "date"]),
+    ("idx_extracted_data_pushed_to_qbo_at", "extracted_data", ["pushed_to_qbo_at"]),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    missing = [
+        (name, table, columns)
+        for name, table, columns in INDEXES
+        if name not in {i["name"] for i in inspector.get_indexes(table)}
+    ]
+    
+    # Build without locking writes on Postgres; CONCURRENTLY can't run in a transaction
+    concurrently = bind.dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, columns in missing:
+            op.create_index(name, table, columns, postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
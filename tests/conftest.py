@@ -0,0 +1,57 @@
+"""
+Shared test fixtures.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api import batch, documents
+from app.core.database import get_async_db, get_db
+from app.main import app
+from app.models.database import Base
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    Point the app's sync and async sessions at a fresh SQLite database.
+    
+    Returns a sessionmaker for seeding rows; stored files go to tmp_path.
+    """
+    monkeypatch.setenv("LOCAL_STORAGE_PATH", str(tmp_path / "storage"))
+    
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    # NullPool: nothing to dispose from this sync fixture
+    AsyncSessionLocal = async_sessionmaker(
+        create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool),
+        expire_on_commit=False,
+    )
+    
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+    
+    # Background work opens its own sessions
+    monkeypatch.setattr(documents, "AsyncSessionLocal", AsyncSessionLocal)
+    monkeypatch.setattr(batch, "AsyncSessionLocal", AsyncSessionLocal)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield SessionLocal
+    
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    engine.dispose()
@@ -0,0 +1,179 @@
+"""
+Tests for analytics tracking and metrics caching.
+"""
+
+import pytest
+
+from app.core.metrics_cache import TTLCache
+from app.services.analytics.tracker import SNAPSHOT_MAX_AGE, AnalyticsTracker
+
+
+class TestTTLCache:
+    """Test the analytics TTL cache."""
+    
+    @pytest.fixture
+    def cache(self):
+        return TTLCache()
+    
+    def test_caches_within_ttl(self, cache):
+        """Test that a fresh entry is served without recomputing."""
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            return len(calls)
+        
+        assert cache.get_or_compute(("summary", 24), 60, compute) == 1
+        assert cache.get_or_compute(("summary", 24), 60, compute) == 1
+        assert len(calls) == 1
+    
+    def test_keys_are_independent(self, cache):
+        """Test that different parameters are cached separately."""
+        assert cache.get_or_compute(("summary", 1), 60, lambda: "a") == "a"
+        assert cache.get_or_compute(("summary", 2), 60, lambda: "b") == "b"
+    
+    def test_expired_entry_recomputes(self, cache):
+        """Test that a zero TTL always recomputes."""
+        values = iter([1, 2])
+        
+        assert cache.get_or_compute("k", 0, lambda: next(values)) == 1
+        assert cache.get_or_compute("k", 0, lambda: next(values)) == 2
+    
+    def test_clear(self, cache):
+        """Test that clear drops cached values."""
+        cache.get_or_compute("k", 60, lambda: "old")
+        cache.clear()
+        
+        assert cache.get_or_compute("k", 60, lambda: "new") == "new"
+    
+    def test_async_coalesces_concurrent_misses(self, cache):
+        """Test that concurrent async misses share one computation."""
+        import asyncio
+        import time
+        
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return "summary"
+        
+        async def burst():
+            return await asyncio.gather(*[
+                cache.get_or_compute_async(("summary", 24), 60, compute)
+                for _ in range(5)
+            ])
+        
+        assert asyncio.run(burst()) == ["summary"] * 5
+        assert len(calls) == 1
+    
+    def test_async_propagates_errors(self, cache):
+        """Test that a failed computation raises and is not cached."""
+        import asyncio
+        
+        def fail():
+            raise RuntimeError("boom")
+        
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_compute_async("k", 60, fail))
+        
+        assert asyncio.run(cache.get_or_compute_async("k", 60, lambda: "ok")) == "ok"
+
+
+class TestAnalyticsTracker:
+    """Test the in-memory analytics tracker."""
+    
+    @pytest.fixture
+    def tracker(self):
+        return AnalyticsTracker()
+    
+    def test_snapshot_is_point_in_time(self, tracker):
+        """Test that the snapshot only changes when refreshed."""
+        tracker.increment("documents.uploaded")
+        snapshot = tracker.snapshot()
+        
+        tracker.increment("documents.uploaded")
+        assert snapshot["counters"]["documents.uploaded"] == 1
+        
+        tracker.refresh_snapshot()
+        assert tracker.snapshot()["counters"]["documents.uploaded"] == 2
+    
+    def test_stale_snapshot_refreshes_on_read(self, tracker):
+        """Test that the snapshot is rebuilt on read once older than its max age."""
+        tracker.increment("documents.uploaded")
+        assert tracker.snapshot()["counters"]["documents.uploaded"] == 1
+        
+        tracker.increment("documents.uploaded")
+        assert tracker.snapshot()["counters"]["documents.uploaded"] == 1
+        
+        # No background refresh task: age the snapshot past SNAPSHOT_MAX_AGE
+        tracker._snapshot_at -= SNAPSHOT_MAX_AGE + 1
+        assert tracker.snapshot()["counters"]["documents.uploaded"] == 2
+    
+    def test_metric_history_is_bounded(self, tracker):
+        """Test that old samples fall off and recent ones are still counted."""
+        from collections import deque
+        from datetime import datetime, timedelta
+        
+        tracker.metrics_by_name["document.size_bytes"] = deque(maxlen=3)
+        
+        for value in range(5):
+            tracker.track_metric("document.size_bytes", value)
+        
+        assert [m.value for m in tracker.metrics_by_name["document.size_bytes"]] == [2, 3, 4]
+        assert tracker.count_since(datetime.utcnow() - timedelta(hours=1)) == 3
+        assert tracker.count_since(datetime.utcnow() + timedelta(hours=1)) == 0
+    
+    def test_timer_samples_are_counted(self, tracker):
+        """Test that timings count toward the summary's metrics_count like metrics do."""
+        from datetime import datetime, timedelta
+        
+        tracker.track_metric("document.size_bytes", 1)
+        tracker.timing("api.request", 12.5)
+        tracker.timing("api.request", 7.5)
+        
+        assert tracker.count_since(datetime.utcnow() - timedelta(hours=1)) == 3
+        assert tracker.count_since(datetime.utcnow() + timedelta(hours=1)) == 0
+    
+    def test_metric_stats_are_running_aggregates(self, tracker):
+        """Test that metric stats cover every sample, not just the retained history."""
+        for value in (3, 1, 2):
+            tracker.track_metric("extraction.confidence", value)
+        
+        assert tracker.get_stats("extraction.confidence") == {
+            "count": 3, "sum": 6, "avg": 2, "min": 1, "max": 3,
+        }
+        assert tracker.get_stats("missing") == {}
+    
+    def test_timer_percentiles_track_exact_values(self, tracker):
+        """Test that streaming p50/p95 stay close to the sorted-sample values."""
+        import random
+        
+        rng = random.Random(0)
+        samples = [rng.uniform(10, 500) for _ in range(5000)]
+        for duration_ms in samples:
+            tracker.timing("api.request.GET", duration_ms)
+        
+        stats = tracker.get_stats()["timers"]["api.request.GET"]
+        ordered = sorted(samples)
+        
+        assert stats["count"] == 5000
+        assert stats["max_ms"] == ordered[-1]
+        assert stats["p50_ms"] == pytest.approx(ordered[2500], rel=0.05)
+        assert stats["p95_ms"] == pytest.approx(ordered[4750], rel=0.05)
+    
+    def test_counters_do_not_lose_concurrent_increments(self, tracker):
+        """Test that increments from many threads all land."""
+        import threading
+        
+        def hammer():
+            for _ in range(10_000):
+                tracker.increment("api.requests.GET")
+        
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert tracker.counter_values()["api.requests.GET"] == 80_000
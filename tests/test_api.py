@@ -2,8 +2,11 @@
 API endpoint tests.
 """
 
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
+
 from app.main import app
 
 
@@ -32,6 +35,7 @@ class TestHealthEndpoints:
         assert data["status"] == "healthy"
 
 
+@pytest.mark.usefixtures("database")
 class TestDocumentEndpoints:
     """Test document processing endpoints."""
     
@@ -59,6 +63,7 @@ class TestDocumentEndpoints:
         response = client.post(
             "/api/documents/upload",
             files={"file": ("test.png", png_data, "image/png")},
+            params={"company_id": str(uuid.uuid4())},
         )
         
         assert response.status_code == 200
@@ -93,3 +98,4 @@ class TestQBOEndpoints:
         
         data = response.json()
         assert data["status"] == "not_implemented"
+
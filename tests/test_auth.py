@@ -0,0 +1,94 @@
+"""
+Tests for API key hashing and rate limiting.
+"""
+
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import auth
+from app.core.auth import RateLimiter
+
+
+class TestRateLimiter:
+    """Test the in-memory sliding window rate limiter."""
+    
+    def test_allows_up_to_limit(self):
+        """Test that max_requests requests pass and the next is rejected."""
+        limiter = RateLimiter(max_requests=3, window_seconds=60)
+        
+        for _ in range(3):
+            limiter.check("key")
+        
+        with pytest.raises(HTTPException) as exc_info:
+            limiter.check("key")
+        assert exc_info.value.status_code == 429
+    
+    def test_keys_are_limited_separately(self):
+        """Test that one key's requests don't count against another's."""
+        limiter = RateLimiter(max_requests=1, window_seconds=60)
+        
+        limiter.check("a")
+        limiter.check("b")
+    
+    def test_window_expiry_allows_again(self, monkeypatch):
+        """Test that requests older than the window stop counting."""
+        now = [1000.0]
+        monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+        limiter = RateLimiter(max_requests=2, window_seconds=60)
+        
+        limiter.check("key")
+        limiter.check("key")
+        now[0] += 60
+        limiter.check("key")
+    
+    def test_zero_limit_rejects_everything(self):
+        """Test that max_requests=0 rejects instead of crashing."""
+        limiter = RateLimiter(max_requests=0, window_seconds=60)
+        
+        with pytest.raises(HTTPException) as exc_info:
+            limiter.check("key")
+        assert exc_info.value.status_code == 429
+    
+    def test_reset(self):
+        """Test that reset clears a key's history."""
+        limiter = RateLimiter(max_requests=1, window_seconds=60)
+        
+        limiter.check("key")
+        limiter.reset("key")
+        limiter.check("key")
+
+
+class TestApiKeyHashing:
+    """Test keyed API key hashes and the legacy SHA-256 fallback."""
+    
+    @pytest.fixture
+    def hash_secret(self, monkeypatch):
+        monkeypatch.setattr(auth, "_API_KEY_HASH_KEY", hashlib.blake2b(b"test-secret").digest())
+    
+    def test_keyed_hash_round_trip(self, hash_secret):
+        """Test that a keyed hash verifies and needs no rehash."""
+        stored = auth.hash_api_key("my-key")
+        
+        assert len(stored) == 32
+        assert auth.verify_api_key_hash("my-key", stored)
+        assert not auth.verify_api_key_hash("other-key", stored)
+        assert not auth.api_key_needs_rehash(stored)
+    
+    def test_legacy_hash_still_verifies(self, hash_secret):
+        """Test that SHA-256 hashes stored before keyed hashing still verify."""
+        stored = hashlib.sha256(b"my-key").hexdigest()
+        
+        assert auth.verify_api_key_hash("my-key", stored)
+        assert not auth.verify_api_key_hash("other-key", stored)
+        assert auth.api_key_needs_rehash(stored)
+    
+    def test_unkeyed_hash_is_legacy(self, monkeypatch):
+        """Test that without API_KEY_HASH_SECRET hashes stay SHA-256."""
+        monkeypatch.setattr(auth, "_API_KEY_HASH_KEY", None)
+        stored = auth.hash_api_key("my-key")
+        
+        assert stored == hashlib.sha256(b"my-key").hexdigest()
+        assert auth.verify_api_key_hash("my-key", stored)
+        assert not auth.api_key_needs_rehash(stored)
@@ -0,0 +1,169 @@
+"""
+Batch upload endpoint tests.
+"""
+
+import io
+import uuid
+import zipfile
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from starlette.datastructures import Headers
+
+from app.api import batch
+from app.models.database import Base, Document
+from app.services.storage.storage import StorageService
+
+
+def _upload(content: bytes, filename: str, content_type: str = "application/pdf") -> UploadFile:
+    return UploadFile(
+        io.BytesIO(content),
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def _zip_upload(entries: dict) -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, content in entries.items():
+            zip_file.writestr(name, content)
+    buffer.seek(0)
+    return _upload(buffer.getvalue(), "documents.zip", "application/zip")
+
+
+@pytest.fixture
+async def db(tmp_path, monkeypatch):
+    """Async session on a fresh in-memory database; files stored under tmp_path."""
+    monkeypatch.setenv("LOCAL_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(batch, "group", MagicMock())  # Don't publish Celery tasks
+    
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    
+    await engine.dispose()
+
+
+@pytest.fixture
+def company_id():
+    return str(uuid.uuid4())
+
+
+class TestBatchEndpoints:
+    """Test batch upload endpoints."""
+    
+    async def test_batch_upload_stores_file_reference(self, db, company_id, tmp_path):
+        """Test that batch-uploaded documents point at their stored file."""
+        response = await batch.batch_upload(
+            files=[_upload(b"%PDF-1.4 statement", "statement.pdf")],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        doc = await db.get(Document, response.uploaded_documents[0])
+        
+        assert response.failed_files == []
+        assert doc.storage_key is not None
+        assert (tmp_path / doc.storage_key).read_bytes() == b"%PDF-1.4 statement"
+        assert doc.content_type == "application/pdf"
+        assert doc.batch_id == response.batch_id
+
+
+class TestBatchDeduplication:
+    """Test that identical files are stored and extracted once per company."""
+    
+    async def test_copies_in_one_batch_resolve_to_first(self, db, company_id):
+        """Test that a repeated file in a batch points at the first copy's document."""
+        response = await batch.batch_upload(
+            files=[
+                _upload(b"%PDF-1.4 receipt", "receipt.pdf"),
+                _upload(b"%PDF-1.4 receipt", "receipt-copy.pdf"),
+            ],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        
+        assert len(response.uploaded_documents) == 1
+        assert response.duplicates == [{
+            "filename": "receipt-copy.pdf",
+            "document_id": response.uploaded_documents[0],
+        }]
+    
+    async def test_reupload_returns_existing_document(self, db, company_id):
+        """Test that a file uploaded in an earlier batch isn't stored again."""
+        first = await batch.batch_upload(
+            files=[_upload(b"%PDF-1.4 receipt", "receipt.pdf")],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        second = await batch.batch_upload(
+            files=[_upload(b"%PDF-1.4 receipt", "receipt.pdf")],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        
+        assert second.uploaded_documents == []
+        assert second.duplicates[0]["document_id"] == first.uploaded_documents[0]
+        assert len((await db.scalars(select(Document.id))).all()) == 1
+    
+    async def test_failed_store_does_not_mark_later_copies_duplicate(self, db, company_id, monkeypatch):
+        """Test that a copy after a failed store is stored instead of skipped."""
+        store_stream = StorageService.store_stream
+        calls = []
+        
+        def flaky_store_stream(self, *args, **kwargs):
+            calls.append(kwargs["filename"])
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return store_stream(self, *args, **kwargs)
+        
+        monkeypatch.setattr(StorageService, "store_stream", flaky_store_stream)
+        
+        response = await batch.batch_upload(
+            files=[
+                _upload(b"%PDF-1.4 receipt", "receipt.pdf"),
+                _upload(b"%PDF-1.4 receipt", "receipt-copy.pdf"),
+            ],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        
+        assert [f["filename"] for f in response.failed_files] == ["receipt.pdf"]
+        assert len(response.uploaded_documents) == 1
+        assert response.duplicates == []
+    
+    async def test_zip_entries_are_deduplicated(self, db, company_id):
+        """Test that ZIP entries are hashed and deduplicated like single uploads."""
+        await batch.batch_upload(
+            files=[_upload(b"%PDF-1.4 known", "known.pdf")],
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        
+        response = await batch.batch_upload_zip(
+            file=_zip_upload({
+                "a.pdf": b"%PDF-1.4 new",
+                "nested/a-copy.pdf": b"%PDF-1.4 new",
+                "known-copy.pdf": b"%PDF-1.4 known",
+            }),
+            company_id=company_id,
+            db=db,
+            api_key="test",
+        )
+        
+        assert response["uploaded"] == 1
+        assert response["total_files"] == 3
+        assert {d["filename"] for d in response["duplicates"]} == {"a-copy.pdf", "known-copy.pdf"}
+        assert all(d["document_id"] for d in response["duplicates"])
@@ -0,0 +1,119 @@
+"""
+Export endpoint tests.
+"""
+
+import csv
+import io
+import uuid
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import export
+from app.core.auth import rate_limit
+from app.main import app
+from app.models.database import Document
+
+
+client = TestClient(app)
+
+COMPANY_ID = str(uuid.uuid4())
+COFFEE_ID, STAPLES_ID, PENDING_ID = (str(uuid.uuid4()) for _ in range(3))
+
+
+@pytest.fixture(autouse=True)
+def documents(database):
+    """Two extracted receipts and one pending upload; API key checks skipped."""
+    app.dependency_overrides[rate_limit] = lambda: "test"
+    
+    with database() as db:
+        db.add_all([
+            Document(
+                id=COFFEE_ID,
+                company_id=COMPANY_ID,
+                filename="coffee.jpg",
+                status="extracted",
+                document_type="receipt",
+                extracted_data={
+                    "vendor": "Blue Bottle",
+                    "total_amount": 4.5,
+                    "date": "01/15/2026",
+                    "category_suggestion": "Meals",
+                },
+            ),
+            Document(
+                id=STAPLES_ID,
+                company_id=COMPANY_ID,
+                filename="tabs\tin\nname.jpg",
+                status="extracted",
+                document_type="receipt",
+                extracted_data={"vendor": "Staples", "total_amount": 12},
+            ),
+            Document(
+                id=PENDING_ID,
+                company_id=COMPANY_ID,
+                filename="pending.pdf",
+                status="uploaded",
+            ),
+        ])
+        db.commit()
+    
+    yield
+    
+    app.dependency_overrides.pop(rate_limit, None)
+
+
+class TestExportFormats:
+    """Test that each export format contains the selected documents."""
+    
+    def test_csv(self):
+        """Test the CSV header and one row per document."""
+        response = client.get("/api/export/csv", params={"status": "extracted"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][:2] == ["ID", "Filename"]
+        assert sorted(row[0] for row in rows[1:]) == sorted([COFFEE_ID, STAPLES_ID])
+        
+        coffee = next(row for row in rows if row[0] == COFFEE_ID)
+        assert coffee[5:9] == ["Blue Bottle", "4.5", "01/15/2026", "Meals"]
+    
+    def test_json(self):
+        """Test that the streamed JSON parses with filters and a document count."""
+        response = client.get("/api/export/json", params={"company_id": COMPANY_ID})
+        assert response.status_code == 200
+        
+        data = orjson.loads(response.content)
+        assert data["filters"] == {"company_id": COMPANY_ID, "status": None, "days": 30}
+        assert data["total_documents"] == 3
+        assert {doc["id"] for doc in data["documents"]} == {COFFEE_ID, STAPLES_ID, PENDING_ID}
+        assert data["documents"][0]["file_type"] is None
+    
+    def test_qbo_import(self):
+        """Test IIF headers and a tab-safe TRNS/SPL pair per extracted receipt."""
+        response = client.get("/api/export/qbo-import")
+        assert response.status_code == 200
+        
+        lines = response.text.splitlines()
+        assert lines[:2] == [export.IIF_TRNS_HEADER.rstrip("\n"), export.IIF_SPL_HEADER.rstrip("\n")]
+        assert len(lines) == 6
+        assert all(len(line.split("\t")) == 10 for line in lines)
+        assert "Blue Bottle\t-4.5\tcoffee.jpg" in response.text
+        assert "tabs in name.jpg" in response.text
+    
+    def test_excel(self):
+        """Test that the workbook opens with the header and one row per document."""
+        openpyxl = pytest.importorskip("openpyxl")
+        
+        response = client.get("/api/export/excel", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == export.EXCEL_MEDIA_TYPE
+        # Already zip-compressed; GZip middleware leaves it alone
+        assert "content-encoding" not in response.headers
+        
+        sheet = openpyxl.load_workbook(io.BytesIO(response.content)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == tuple(name for name, _ in export.EXCEL_COLUMNS)
+        assert sorted(row[0] for row in rows[1:]) == sorted([COFFEE_ID, STAPLES_ID, PENDING_ID])
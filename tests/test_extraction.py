@@ -0,0 +1,111 @@
+"""
+Tests for the document extraction service (AI providers stubbed out).
+"""
+
+import base64
+import json
+import threading
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.extraction import pdf_utils
+from app.services.extraction.extractor import (
+    BANK_STATEMENT_HEADER_PROMPT,
+    BANK_STATEMENT_PAGES_PROMPT,
+    DocumentExtractor,
+)
+
+
+def _transaction(page: int) -> dict:
+    return {
+        "date": "2026-01-15",
+        "description": f"Page {page} purchase",
+        "amount": -10.00 - page,
+        "transaction_type": "debit",
+    }
+
+
+def _page_number(data_url: str) -> int:
+    """Page number of a stubbed page image (the bytes b"page-<n>")."""
+    return int(base64.b64decode(data_url.split(",", 1)[1]).decode().removeprefix("page-"))
+
+
+class FakeCompletions:
+    """Stands in for AsyncOpenAI().chat.completions; each image is b"page-<n>"."""
+    
+    def __init__(self):
+        self.requests = []
+    
+    async def create(self, model, messages, max_tokens):
+        content = messages[0]["content"]
+        prompt = content[0]["text"]
+        pages = [_page_number(part["image_url"]["url"]) for part in content[1:]]
+        self.requests.append((prompt, pages, max_tokens))
+        
+        if prompt == BANK_STATEMENT_HEADER_PROMPT:
+            text, finish_reason = json.dumps({"bank_name": "Test Bank"}), "stop"
+        elif prompt == BANK_STATEMENT_PAGES_PROMPT:
+            # Busy pages: the combined reply runs out of tokens mid-array
+            full = json.dumps([[_transaction(page)] for page in pages])
+            text, finish_reason = full[:len(full) // 2], "length"
+        else:
+            text, finish_reason = json.dumps([_transaction(pages[0])]), "stop"
+        
+        return SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content=text), finish_reason=finish_reason)
+        ])
+
+
+class TestBankStatementExtraction:
+    """Test batched bank statement page requests."""
+    
+    @pytest.fixture
+    def extractor(self):
+        return DocumentExtractor(api_key="test", provider="openai")
+    
+    @pytest.mark.asyncio
+    async def test_truncated_batch_reply_retries_per_page(self, extractor):
+        """Test that a reply cut off at max_tokens doesn't drop the batch's transactions."""
+        completions = FakeCompletions()
+        aclient = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        pages = [f"page-{n}".encode() for n in range(4)]
+        
+        statement = await extractor.aextract_bank_statement(pages, aclient=aclient)
+        
+        assert [txn.description for txn in statement.transactions] == [
+            f"Page {n} purchase" for n in range(4)
+        ]
+        # The 4-page request got a 4-page token budget before falling back
+        batch_requests = [r for r in completions.requests if r[0] == BANK_STATEMENT_PAGES_PROMPT]
+        assert [r[2] for r in batch_requests] == [4 * 4096]
+
+
+class TestPdfThread:
+    """Test that PDF rendering stays on the single PyMuPDF thread."""
+    
+    @pytest.mark.asyncio
+    async def test_pages_render_and_close_on_pdf_thread(self, monkeypatch):
+        """Test that every step of the page generator, including close, runs on one thread."""
+        threads = []
+        
+        def fake_render(pdf_data, dpi, max_pages):
+            try:
+                for page in range(3):
+                    threads.append(threading.current_thread().name)
+                    yield b"page", (page, page)
+            finally:
+                threads.append(threading.current_thread().name)
+        
+        monkeypatch.setattr(pdf_utils, "_render_pdf_pages", fake_render)
+        
+        # Stop early: the rest of the document is closed on the PDF thread too
+        async with aclosing(pdf_utils.aiter_pdf_pages(b"%PDF")) as pages:
+            async for _ in pages:
+                break
+        assert len(pdf_utils.pdf_to_images(b"%PDF")) == 3
+        
+        assert len(threads) == 6
+        assert len(set(threads)) == 1
+        assert threads[0].startswith("pymupdf")
@@ -6,6 +6,7 @@ import pytest
 from datetime import date
 from decimal import Decimal
 
+from app.services.matching import matcher as matcher_module
 from app.services.matching.matcher import (
     BankFeedMatcher,
     VendorMatcher,
@@ -115,6 +116,45 @@ class TestBankFeedMatcher:
         assert len(matches) == 1
         assert matches[0].qbo_match.matched == False
     
+    def test_same_amount_transactions_match_once_each(self, matcher):
+        """Test that a matched QBO transaction isn't reused for a later row."""
+        qbo_transactions = [
+            QBOBankTransaction(id="qbo_a", date=date(2026, 1, 5), amount=Decimal("-42.00"), description="NETFLIX"),
+            QBOBankTransaction(id="qbo_b", date=date(2026, 2, 5), amount=Decimal("-42.00"), description="NETFLIX"),
+        ]
+        statement = BankStatementData(
+            transactions=[
+                BankTransaction(date=date(2026, 2, 5), description="Netflix", amount=Decimal("-42.00"), transaction_type="debit"),
+                BankTransaction(date=date(2026, 1, 5), description="Netflix", amount=Decimal("-42.00"), transaction_type="debit"),
+            ],
+            check_images=[],
+        )
+        
+        matches = matcher.match_statement_to_bank_feed(statement, qbo_transactions)
+        
+        assert [m.qbo_match.qbo_transaction_id for m in matches] == ["qbo_b", "qbo_a"]
+    
+    def test_same_amount_rows_get_best_overall_assignment(self, matcher):
+        """Test that an earlier row doesn't take a match a later row needs more."""
+        qbo_transactions = [
+            QBOBankTransaction(id="qbo_a", date=date(2026, 1, 10), amount=Decimal("-42.00"), description="NETFLIX"),
+            QBOBankTransaction(id="qbo_b", date=date(2026, 1, 12), amount=Decimal("-42.00"), description="NETFLIX"),
+        ]
+        statement = BankStatementData(
+            transactions=[
+                # Best alone with qbo_a (same day), but still fine with qbo_b
+                BankTransaction(date=date(2026, 1, 10), description="Netflix", amount=Decimal("-42.00"), transaction_type="debit"),
+                # Only close enough to qbo_a
+                BankTransaction(date=date(2026, 1, 8), description="Netflix", amount=Decimal("-42.00"), transaction_type="debit"),
+            ],
+            check_images=[],
+        )
+        
+        matches = matcher.match_statement_to_bank_feed(statement, qbo_transactions)
+        
+        assert [m.qbo_match.qbo_transaction_id for m in matches] == ["qbo_b", "qbo_a"]
+        assert all(m.qbo_match.matched for m in matches)
+    
     def test_check_image_linking(self, matcher, sample_qbo_transactions):
         """Test that check images are linked to check transactions."""
         check_image = CheckData(
@@ -222,3 +262,44 @@ class TestVendorMatcher:
         assert matcher.suggest_vendor_name("AMAZON.COM LLC") == "Amazon.Com"
         assert matcher.suggest_vendor_name("staples inc") == "Staples"
         assert matcher.suggest_vendor_name("") == "Unknown Vendor"
+
+
+@pytest.fixture(params=["difflib", "rapidfuzz"])
+def similarity_backend(request, monkeypatch):
+    """Run a test with and without RapidFuzz installed."""
+    if request.param == "rapidfuzz":
+        pytest.importorskip("rapidfuzz")
+        assert matcher_module.fuzz is not None
+    else:
+        monkeypatch.setattr(matcher_module, "fuzz", None)
+    return request.param
+
+
+class TestTextSimilarity:
+    """Test that similarity scores don't depend on the installed backend."""
+    
+    @pytest.mark.parametrize("text, other, expected", [
+        ("netflix", "netflix.com", 7 / 9),
+        # Indel (fuzz.ratio) would score this 9 / 11
+        ("amazon amzn", "amzn amazon", 6 / 11),
+        ("abcd", "wxyz", 0.0),
+    ])
+    def test_ratio_is_difflib_ratio(self, similarity_backend, text, other, expected):
+        """Test that ratios are difflib's under both backends."""
+        assert matcher_module._TextSimilarity(text).ratio(other) == pytest.approx(expected)
+    
+    def test_floor_keeps_ratios_above_it(self, similarity_backend):
+        """Test that a floor below the ratio doesn't change it."""
+        similarity = matcher_module._TextSimilarity("amazon amzn")
+        
+        assert similarity.ratio("amzn amazon", floor=0.5) == pytest.approx(6 / 11)
+        assert similarity.ratio("wxyz", floor=0.3) == 0.0
+    
+    def test_reordered_vendor_name_not_matched(self, similarity_backend):
+        """Test that vendor matching uses the same threshold under both backends."""
+        vendor, score = VendorMatcher().find_or_suggest_vendor(
+            "Amazon Amzn", [{"id": "v1", "name": "Amzn Amazon"}]
+        )
+        
+        assert vendor is None
+        assert score == pytest.approx(6 / 11)
@@ -0,0 +1,43 @@
+"""
+Tests for webhook signature verification.
+"""
+
+import hashlib
+import hmac
+
+from app.api.webhooks import verify_webhook_signature
+
+
+PAYLOAD = b'{"from": "receipts@example.com"}'
+SECRET = "webhook-secret"
+
+
+def _sign(payload: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+class TestVerifyWebhookSignature:
+    """Test HMAC-SHA256 webhook signatures."""
+    
+    def test_valid_signature(self):
+        """Test that a correctly signed payload verifies, repeatedly."""
+        signature = _sign(PAYLOAD, SECRET)
+        
+        assert verify_webhook_signature(PAYLOAD, signature, SECRET)
+        # Second check reuses the cached keyed context
+        assert verify_webhook_signature(PAYLOAD, signature, SECRET)
+    
+    def test_uppercase_hex_signature(self):
+        """Test that hex case doesn't matter."""
+        assert verify_webhook_signature(PAYLOAD, _sign(PAYLOAD, SECRET).upper(), SECRET)
+    
+    def test_wrong_secret_or_payload(self):
+        """Test that a signature for another secret or payload is rejected."""
+        assert not verify_webhook_signature(PAYLOAD, _sign(PAYLOAD, "other-secret"), SECRET)
+        assert not verify_webhook_signature(PAYLOAD + b" ", _sign(PAYLOAD, SECRET), SECRET)
+    
+    def test_malformed_signature(self):
+        """Test that non-hex or odd-length signatures are rejected, not raised."""
+        assert not verify_webhook_signature(PAYLOAD, "not-hex", SECRET)
+        assert not verify_webhook_signature(PAYLOAD, "abc", SECRET)
+        assert not verify_webhook_signature(PAYLOAD, "", SECRET)